@@ -2,8 +2,10 @@ from pyrogram import Client
 from utils.config import Config
 from statemanager import StateManager
 from utils.logger import LOGGER
+from helpers.api_governor import API_GOVERNOR
 import os
 import sqlite3
+import time
 
 class Bot(Client):
     # Class-level (shared across all bot instances)
@@ -26,6 +28,40 @@ class Bot(Client):
             bot_token=Config.BOT_TOKEN
         )
         self._username = None # Bot username instance variable
+        self.plugin_load_seconds = 0.0 # Time spent importing bot/plugins during start()
+
+    def load_plugins(self):
+        started = time.perf_counter()
+        super().load_plugins()
+        self.plugin_load_seconds = time.perf_counter() - started
+
+    # Outbound calls go through the API governor (global + per-chat rate budgets, shared FloodWait handling)
+    async def send_message(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().send_message, chat_id, *args, **kwargs)
+
+    async def ban_chat_member(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().ban_chat_member, chat_id, *args, **kwargs)
+
+    async def unban_chat_member(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().unban_chat_member, chat_id, *args, **kwargs)
+
+    async def get_chat(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().get_chat, chat_id, *args, **kwargs)
+
+    async def get_chat_member(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().get_chat_member, chat_id, *args, **kwargs)
+
+    async def create_chat_invite_link(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().create_chat_invite_link, chat_id, *args, **kwargs)
+
+    async def revoke_chat_invite_link(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().revoke_chat_invite_link, chat_id, *args, **kwargs)
+
+    async def approve_chat_join_request(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().approve_chat_join_request, chat_id, *args, **kwargs)
+
+    async def decline_chat_join_request(self, chat_id, *args, **kwargs):
+        return await API_GOVERNOR.call(chat_id, super().decline_chat_join_request, chat_id, *args, **kwargs)
 
 
     # Class method to update state when admin wants to update subscriptions
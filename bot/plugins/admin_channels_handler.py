@@ -4,11 +4,12 @@ from pyrogram.types import InlineKeyboardButton,KeyboardButton, InlineKeyboardMa
 from pyrogram.enums import ChatMemberStatus, ChatType
 from pyrogram.errors import ChatAdminRequired
 from db.connection import get_db
-from db.user_helpers import add_user
 from db.channel_helpers import get_channel_name_by_id, get_channel_link, update_channel_link, add_or_update_channel_connection, get_all_channels, delete_channel
-from db.subscription_helpers import add_subscription
+from db.scan_helpers import get_scan_checkpoint, import_scan_batch, clear_scan_checkpoint
+from db.executor import run_db
 # # from db.connection import get_db
 from helpers.text_helper import sanitize_fullname
+from helpers.bot_privileges import BOT_PRIVILEGES
 from helpers.filters import admins_filter, calling_bot_filter, anonymous_message_filter
 # from db.channel_helpers import add_channel, delete_channel, get_all_channels
 from utils.logger import LOGGER
@@ -22,7 +23,7 @@ Channel : /start@botusername
 Admin : /addchannel
 Admin : /showchannels
 Admin : /removechannel
-Channel : /scan
+Channel : /scan (resumable, /scan restart starts over)
 +=======================================================================================================+
 """
 
@@ -116,16 +117,19 @@ async def has_invite_users_permission(client: Client, message: Message) -> bool:
         chat_id = message.chat.id
         
         try:
-            # Get the bot's status and privileges in the chat
-            chat_member = await client.get_chat_member(chat_id, client.me.id)
-            # Check if the bot is an administrator
-            if chat_member.status == ChatMemberStatus.ADMINISTRATOR:
-                # Check if the bot has "Invite Users" permission
-                privileges = chat_member.privileges
-                if privileges and privileges.can_invite_users:
-                    return True
+            # Get the bot's status and privileges in the chat (cached), a "no" is re-checked
+            # in case the admin just granted the permission and the update was missed
+            for refresh in (False, True):
+                chat_member = await BOT_PRIVILEGES.get(chat_id, refresh=refresh)
+                # Check if the bot is an administrator
+                if chat_member.status == ChatMemberStatus.ADMINISTRATOR:
+                    # Check if the bot has "Invite Users" permission
+                    privileges = chat_member.privileges
+                    if privileges and privileges.can_invite_users:
+                        return True
         except ChatAdminRequired:
             # If the bot is not an admin, it will raise this error
+            BOT_PRIVILEGES.invalidate(chat_id)
             return False
     return False
 
@@ -350,63 +354,102 @@ async def cancel_delete(client: Client, callback_query: CallbackQuery):
 
 # ----------------------------- scan channel for existing users - /scan ------------------------------------
 
+# Members written per transaction (and checkpoint), and how often the progress message is edited
+SCAN_BATCH_SIZE = 500
+SCAN_PROGRESS_EVERY = 2000
+SCAN_DAYS = 3
+
+# Channels with a /scan in progress, a second /scan there is refused
+_scans_running = set()
+
+
+def _scan_report(title: str, progress: dict) -> str:
+    return (
+        f"- -**{title}**- -:\n\n"
+        f"Members read: {progress['scanned']}\n\n"
+        f"✅ Added: {progress['inserted']}\n\n"
+        f"ℹ️ Already subscribed: {progress['skipped']}\n\n"
+        f"❌ Failed: {progress['failed']}\n\n"
+    )
+
+
 @Bot.on_message(filters.command("scan") & (filters.channel | (filters.group & (anonymous_message_filter | admins_filter) )))
 async def scan_members(client: Client, message: Message):
-    """Handles the /scan command in the channel to fetch member details."""
+    """
+    Handles the /scan command in the channel to fetch member details.
+
+    Members are streamed from get_chat_members and written SCAN_BATCH_SIZE at a time, each batch
+    together with a checkpoint. If the scan is interrupted, the next /scan skips the members already
+    read and carries on; `/scan restart` discards the checkpoint. Telegram doesn't promise a stable
+    member order, but the writes are idempotent so a resumed scan can only miss what moved, not duplicate.
+    """
+    channel_id = message.chat.id
+    if channel_id in _scans_running:
+        await message.reply("A scan is already running here.")
+        return
+    _scans_running.add(channel_id)
     try:
-        channel_id = message.chat.id
-        
         # Check if the bot is an admin in the channel
-        bot_user = await client.get_me()
-        bot_member = await client.get_chat_member(channel_id, bot_user.id)
-        
+        bot_member = await BOT_PRIVILEGES.get(channel_id)
+        if bot_member.status != ChatMemberStatus.ADMINISTRATOR:
+            bot_member = await BOT_PRIVILEGES.get(channel_id, refresh=True)
+
         if bot_member.status != ChatMemberStatus.ADMINISTRATOR:
             await message.reply("Please make the bot an admin with appropriate privileges.")
             return
 
-        # Initialize a list to hold non-admin members
-        non_admin_users = []
+        if len(message.command) > 1 and message.command[1].lower() == "restart":
+            await run_db(clear_scan_checkpoint, channel_id)
+
+        progress = {"scanned": 0, "inserted": 0, "skipped": 0, "failed": 0}
+        checkpoint = await run_db(get_scan_checkpoint, channel_id)
+        if checkpoint:
+            progress.update({key: checkpoint[key] for key in progress})
+        resume_after = progress["scanned"]
+
+        progress_message = await message.reply(
+            f"Resuming the scan after {resume_after} members..." if resume_after else "Scanning members..."
+        )
 
-        # Use async for to collect members from the async generator
+        position = 0
+        batch = []
+        next_progress_edit = resume_after + SCAN_PROGRESS_EVERY
         async for member in client.get_chat_members(channel_id):
+            position += 1
+            if position <= resume_after:
+                continue  # Written by the interrupted run
+
             if not member.user.is_bot and member.status not in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER]:
-                non_admin_users.append(member)
-        
-        if not non_admin_users:
-            await message.reply("No non-admin users found to scan.")
+                batch.append({
+                    "user_id": member.user.id,
+                    "username": member.user.username,
+                    "fullname": await sanitize_fullname(member.user.first_name, member.user.last_name),
+                })
+
+            if position % SCAN_BATCH_SIZE == 0:
+                progress = await run_db(import_scan_batch, channel_id, batch, SCAN_DAYS, {**progress, "scanned": position})
+                batch = []
+
+            if position >= next_progress_edit:
+                next_progress_edit += SCAN_PROGRESS_EVERY
+                try:
+                    await progress_message.edit_text(_scan_report("Scanning", {**progress, "scanned": position}))
+                except Exception as e:
+                    LOGGER.warning(f"Could not update scan progress in {channel_id}: {e}")
+
+        if position > progress["scanned"]:
+            progress = await run_db(import_scan_batch, channel_id, batch, SCAN_DAYS, {**progress, "scanned": position})
+        await run_db(clear_scan_checkpoint, channel_id)
+        LOGGER.info(f"Scan of channel {channel_id} finished: {progress}")
+
+        if progress["inserted"] + progress["skipped"] + progress["failed"] == 0:
+            await progress_message.edit_text("No non-admin users found to scan.")
             return
-        
-        Total = len(non_admin_users)
-        failed, success = 0,0
-        
-        # Add non-admin users to the database and set their subscription
-        with next(get_db()) as db:
-            for member in non_admin_users:
-                user_id = member.user.id
-                username = member.user.username
-                fullname = sanitize_fullname(member.user.first_name, member.user.last_name)
-                
-                # Add user to database
-                user = add_user(db, user_id, username, fullname)
-                if not user:
-                    failed += 1
-                    continue
-                
-                # Add subscription with 3 days duration
-                subscription = add_subscription(db, user_id, channel_id, 3)
-                if not subscription:
-                    failed += 1
-                success +=1
-            
-        status_message = (
-            f"- -**Scan Summary**- -:\n\n"
-            f"Total Users: {Total}\n\n"
-            f"✅ Success: {success}\n\n"
-            f"❌ Failed: {failed}\n\n"
-        )
 
-        # Send message to the user who initiated the scan command
-        await message.reply(status_message)
+        # Final summary replaces the progress message
+        await progress_message.edit_text(_scan_report("Scan Summary", progress))
     except Exception as e:
         LOGGER.info(f"Error in scan_members: {e}")
-        await message.reply("❌ An error occurred while scanning.")
\ No newline at end of file
+        await message.reply("❌ An error occurred while scanning. Send /scan again to resume.")
+    finally:
+        _scans_running.discard(channel_id)
@@ -3,12 +3,13 @@ from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 from utils.logger import LOGGER
 from helpers.filters import admins_filter
-from helpers.text_helper import send_long_message
+from helpers.notification_dispatcher import wake_dispatcher
+from db.executor import run_db
+from db.outbox_helpers import add_notifications
 from helpers.scheduler import run_daily_routine_manually
 from helpers.additional_bot_helpers import check_status
 from utils.logger import LOGGER
 from utils.config import Config
-from bot.bot_instance import get_bot_instance
 import asyncio
 
 """
@@ -35,9 +36,12 @@ async def clean_users(_, message):
 async def check_status_handler(_, message):
     try:
         admin_id = message.chat.id
-        bot_instance = await get_bot_instance()
-        response, _ = await check_status()
-        await send_long_message(bot_instance,admin_id,response)
+        admin_status_reports, _ = await check_status(admin_id)
+        response = admin_status_reports.get(admin_id, "ℹ️ No channels found for your account.")
+        # Delivered by the notification dispatcher, keyed on the command so a retried update isn't answered twice
+        if not await run_db(add_notifications, [(admin_id, response, f"status:{admin_id}:{message.id}")]):
+            raise RuntimeError("could not enqueue the status report")
+        wake_dispatcher()
     except Exception as e:
         LOGGER.error(f"Error in check_status_handler : {e}")
         await message.reply(" Sorry an error occured.")
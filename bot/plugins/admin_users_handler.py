@@ -7,13 +7,14 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQ
 from pyrogram.errors import FloodWait, ChatAdminRequired, UserNotParticipant, PeerIdInvalid, UserBannedInChannel
 from helpers.filters import admins_filter,normal_filter, is_bulk_updating
 from db.connection import get_db
+from db.executor import run_db
 from db.user_helpers import get_user_channels, get_user_subscription
 from db.channel_helpers import get_all_channels, get_channel_mention, get_invite_link
-from db.subscription_helpers import get_subscriptions, update_subscription
+from db.subscription_helpers import get_subscriptions_page, update_subscription, bulk_update_subscriptions
 from db.verification_helpers import generate_verification_code, validate_and_add_user
 from utils.logger import LOGGER
 from bot.bot_instance import get_bot_instance
-from helpers.text_helper import sanitize_fullname, send_long_message
+from helpers.text_helper import sanitize_fullname, send_long_message, parse_bulk_update, format_bulk_update_report
 from helpers.additional_bot_helpers import update_single_user_subscription
 
 
@@ -216,16 +217,11 @@ async def handle_show_users(client: Client, callback_query: CallbackQuery):
         # Delete the original message containing the buttons
         await callback_query.message.delete()
 
-        found, subscriptions = await get_users_list(channel_id)
-        if not found:
-            await callback_query.message.reply_text(f"ℹ️ No users found in **{channel_name}**")
-            return
-        
         waiting_msg = await callback_query.message.reply_text("Please wait loading users info...")
-        response = await format_users_list(channel_name, subscriptions)
-
-        await send_long_message(client, admin_id, response)
+        user_ids = await send_users_list(client, admin_id, channel_id, channel_name)
         await waiting_msg.delete()
+        if not user_ids:
+            await callback_query.message.reply_text(f"ℹ️ No users found in **{channel_name}**")
     except Exception as e:
         LOGGER.error(f"Error showing users handle_show_users: {e}")
         await callback_query.message.reply_text("❌ An error occurred while showing users.")
@@ -233,24 +229,44 @@ async def handle_show_users(client: Client, callback_query: CallbackQuery):
 
 # -------------------------- Helper Functions to get user list 
 
-# helper function to get users list
-async def get_users_list(channel_id):
-    with next(get_db()) as db:
-        subscriptions = get_subscriptions(db, channel_id)
-        if not subscriptions:
-            return False, None
-        return True, subscriptions
-    
-async def format_users_list(channel_name, subscriptions):
+USERS_PAGE_SIZE = 500
+
+# helper function to read a channel's users page by page
+async def iter_users_pages(channel_id, page_size: int = USERS_PAGE_SIZE):
+    after_user_id = None
+    while True:
+        page = await run_db(get_subscriptions_page, channel_id, after_user_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_user_id = page[-1]['user_id']
+
+async def send_users_list(client, admin_id, channel_id, channel_name):
+    """
+    Sends the numbered list of a channel's users to the admin, one page at a time.
+
+    :return: The listed user ids in display order (index #1 is user_ids[0]).
+    """
+    user_ids = []
+    async for page in iter_users_pages(channel_id):
+        response = await format_users_list(channel_name, page, start_index=len(user_ids) + 1)
+        user_ids.extend(sub['user_id'] for sub in page)
+        await send_long_message(client, admin_id, response)
+    return user_ids
+
+async def format_users_list(channel_name, subscriptions, start_index: int = 1):
     """
     Formats the list of subscriptions into a readable string.
 
     :param channel_name: The name of the channel for display purposes.
     :param subscriptions: List of subscription dictionaries.
+    :param start_index: Number of the first user, the header is only added for the first page.
     :return: A formatted string containing user information.
     """
-    response = f"__Users in the Channel__ - **{channel_name}**:\n\n"
-    for idx, sub in enumerate(subscriptions, start=1):
+    response = f"__Users in the Channel__ - **{channel_name}**:\n\n" if start_index == 1 else ""
+    for idx, sub in enumerate(subscriptions, start=start_index):
         full_name = sub['fullname']
         user_id = sub['user_id']
         expiry_date = sub['expiry_date']
@@ -307,16 +323,12 @@ async def handle_subscription_update(client: Client, callback_query: CallbackQue
         # Delete the original message containing the buttons
         await callback_query.message.delete()
 
-        found, subscriptions = await get_users_list(channel_id)
-        if not found:
-            await callback_query.message.reply_text(f"ℹ️ No users found in {channel_name}")
-            return
-        
         waiting_msg = await callback_query.message.reply_text("Please wait loading users info...")
-        response = await format_users_list(channel_name, subscriptions)
-
-        await send_long_message(client, admin_id, response)
+        user_ids = await send_users_list(client, admin_id, channel_id, channel_name)
         await waiting_msg.delete()
+        if not user_ids:
+            await callback_query.message.reply_text(f"ℹ️ No users found in {channel_name}")
+            return
         
         help_message = (
             f"**Help for Bulk Subscription Update Command**\n\n"
@@ -358,7 +370,7 @@ async def handle_subscription_update(client: Client, callback_query: CallbackQue
         user_data = {
             'channel_id': channel_id,
             'channel_name': channel_name,
-            'subscriptions': subscriptions
+            'user_ids': user_ids
         }
         Bot.add_bulk_update_state(admin_id, user_data)
 
@@ -387,63 +399,36 @@ async def process_admin_input(client: Client, message: Message):
             Bot.delete_bulk_update_state(admin_id)
             await message.reply_text("Subscription updates process completed.")
             #sending the updated list
-            found , subscriptions = await get_users_list(channel_id)
-            if not found:
-                await message.reply_text(f"ℹ️ No users found in {channel_name}")
-                return
-            
-            response = await format_users_list(channel_name, subscriptions)
-            
             waiting_msg = await message.reply_text("Please wait loading users info...")
-            await send_long_message(client, admin_id, response)
+            user_ids = await send_users_list(client, admin_id, channel_id, channel_name)
             await waiting_msg.delete()
+            if not user_ids:
+                await message.reply_text(f"ℹ️ No users found in {channel_name}")
             return
 
-        # Process the admin's input
-        updates = message.text.strip().lower()
-        update_lines = updates.split('\n')
-
-        results = []
-        for line in update_lines:
-            if not line.strip():
-                continue  # Skip empty lines
-
-            parts = line.strip().split()
-            idx = parts[0]
-            if not idx.isdigit():
-                results.append(f"Invalid index '{idx}'.")
-                continue
-
-            idx = int(idx) - 1  # Adjust for zero-based index
-            if idx < 0 or idx >= len(user_data['subscriptions']):
-                results.append(f"Index '{idx + 1}' is out of range.")
-                continue
-
-            subscription = user_data['subscriptions'][idx]
-            user_id = subscription['user_id']
-
-            # Determine the action
-            if len(parts) == 1:
-                # Default extension
-                duration_text = '30d'
-            elif len(parts) == 2:
-                duration_text = parts[1]
-            elif len(parts) == 3:
-                duration_text = parts[1] + parts[2]
-            else:
-                results.append(f"Invalid format in line: '{line}'.")
-                continue
+        # Parse and validate every line first, against the list the admin was shown
+        changes, kicks, results = parse_bulk_update(message.text, user_data['user_ids'])
+
+        # Apply all duration/date changes in one transaction
+        updated = []
+        if changes:
+            try:
+                updated = await run_db(bulk_update_subscriptions, channel_id, admin_id, changes)
+            except Exception as e:
+                results.append(f"❌ None of the {len(changes)} updates were applied: {e}")
 
-            # Update the subscription
+        # Kicks need a Telegram call per user
+        kicked = []
+        for user_id in kicks:
             with next(get_db()) as db:
                 try:
-                    _, result = await update_single_user_subscription(db, user_id, channel_id, duration_text)
-                    results.append(result)
+                    _, result = await update_single_user_subscription(db, user_id, channel_id, admin_id, 'kick')
+                    kicked.append(result)
                 except Exception as e:
-                    results.append(f"Error updating user {user_id}: {str(e)}")
+                    results.append(f"Error removing user {user_id}: {str(e)}")
 
-        # Send the update results to the admin
-        await message.reply_text('\n'.join(results) + "\n\nYou can enter more updates or type 'done' to finish.")
+        # Send one consolidated report to the admin
+        await send_long_message(client, admin_id, format_bulk_update_report(channel_name, updated, kicked, results))
     except Exception as e:
         LOGGER.error(f"Error processing admin input process_admin_input: {e}")
         await message.reply_text("❌ An error occurred while processing your input.")
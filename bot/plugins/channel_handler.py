@@ -3,24 +3,32 @@ from pyrogram import Client, filters, errors
 from pyrogram.types import Message
 from pyrogram.errors import BadRequest, FloodWait, ChatAdminRequired
 from db.connection import get_db
-from db.subscription_helpers import add_subscription
-from db.channel_helpers import get_all_channels, get_channel_link, update_channel_link, get_channel_mention
-from db.user_helpers import get_user_mention, get_user_subscription
+from db.async_connection import get_async_db
+from db.channel_helpers import get_all_channels, get_channel_link, update_channel_link
 from pyrogram.types import InlineKeyboardButton,KeyboardButton, InlineKeyboardMarkup, CallbackQuery,ReplyKeyboardMarkup, Message
 from pyrogram.errors import ChatAdminRequired, UserNotParticipant, PeerIdInvalid
-from db.pendingrequest_helpers import check_pending_request, delete_pending_request
-from helpers.filters import is_new_user_updating, admins_filter, devs_filter, is_deleting_channel_links_filter
+from db.pendingrequest_helpers import load_join_context_async, promote_pending_request_async
+from helpers.filters import is_new_user_updating, admins_filter, devs_filter, is_deleting_channel_links_filter, bot_member_updated_filter
 from helpers.additional_bot_helpers import update_single_user_subscription
 from utils.logger import LOGGER
 from bot.bot_instance import get_bot_instance
-import asyncio
+from helpers.bot_privileges import BOT_PRIVILEGES
+from helpers.notification_dispatcher import wake_dispatcher
+from helpers.join_request_queue import JOIN_REQUEST_QUEUE
+from helpers.scheduler import schedule_kick_retry
+from db.kick_retry_helpers import resume_kick_retries
+from db.executor import run_db
+from pyrogram.enums import ChatMemberStatus
+from db.outbox_helpers import enqueue_notifications_async
+from pyrogram.types import ChatMemberUpdated
 
 
 """
 +=======================================================================================================+
 --------------------------------      LIST OF FEATURES      --------------------------------------------
 +=======================================================================================================+
-Channel : Handling User joins
+Channel : Handling User joins (queued, own worker pool)
+Channel : Tracking the bot's own privileges (ChatMemberUpdated), resumes queued removals
 Admin : Handling Edit subscription for new user join
 Admin : /deletelinks
 Admin : /regenlink
@@ -85,137 +93,158 @@ Admin : /regenlink
 #         else:
 #             LOGGER.info(f"No pending request found for user {user_id} in channel/group {channel_id}. Doing nothing.")
 
+# --------------------- Keep the bot's own status/privileges per chat up to date ----------------------------------------------------
+
+@Bot.on_chat_member_updated(bot_member_updated_filter)
+async def track_bot_privileges(client: Client, update: ChatMemberUpdated):
+    """
+    Feeds BOT_PRIVILEGES, so permission checks don't need a get_chat_member call.
+    When the bot may remove members again, removals queued for retry in that chat are resumed right away.
+    """
+    try:
+        BOT_PRIVILEGES.update_from_member(update.chat.id, update.new_chat_member)
+
+        member = update.new_chat_member
+        if member and member.status == ChatMemberStatus.ADMINISTRATOR and member.privileges and member.privileges.can_restrict_members:
+            if await run_db(resume_kick_retries, update.chat.id):
+                LOGGER.info(f"Bot can remove members in chat {update.chat.id} again, resuming queued removals")
+                schedule_kick_retry(update.chat.id)
+    except Exception as e:
+        LOGGER.error(f"Error updating bot privileges for chat {update.chat.id}: {e}")
+
 # --------------------- Accept user join request automatically and ask admin for new user subscription duration updates----------------------------------------------------
 
 @Bot.on_chat_join_request()
 async def check_join_request(client: Client, message: Message):
+    """Hands the request to JOIN_REQUEST_QUEUE and returns, the update worker is free for the next update."""
     try:
-        user_id = message.from_user.id
-        channel_id = message.chat.id  # The group/channel ID where the request is coming from
+        await JOIN_REQUEST_QUEUE.submit(client, message)
+    except Exception as e:
+        LOGGER.error(f"Error queueing join request: {e}")
 
-        # Log the incoming join request
-        LOGGER.info(f"Received join request from user {user_id} for channel/group {channel_id}")
 
-        # Open session to check if the user has a pending request
-        with next(get_db()) as session:  # Assuming get_session is a function to fetch DB session
-            response = ()
+async def process_join_request(client: Client, message: Message, mark_approved):
+    """
+    Runs on a JOIN_REQUEST_QUEUE worker. Approves the request as soon as the join context is known,
+    the confirmations are enqueued in the outbox and sent later by the dispatcher.
+    Errors are logged and counted by the queue.
+    """
+    user_id = message.from_user.id
+    channel_id = message.chat.id  # The group/channel ID where the request is coming from
 
-            # Check if the join request is from a user who mistakenly left the group and still has a subscription running
-            subscription = get_user_subscription(session, user_id, channel_id)
-            if subscription is not None:
-                await client.approve_chat_join_request(channel_id, user_id)
-                bot_instance = await get_bot_instance()
+    # Log the incoming join request
+    LOGGER.info(f"Received join request from user {user_id} for channel/group {channel_id}")
 
-                user_warn_text = (
-                    f"🎉 You have been successfully accepted to {get_channel_mention(session,channel_id)}.\n\n"
-                    f"😊 Please don't leave us when you still have an active subscription.\n\n"
-                )
-                await bot_instance.send_message(
-                    chat_id=user_id,
-                    text=user_warn_text
-                )
-                response = (
-                    f"- - - User Subscription info - - -\n"
-                    f"👤 {get_user_mention(session,user_id)}\n\n"
-                    f"✨ {get_channel_mention(session,channel_id)}\n\n"
-                    f"📅 Expires: `{subscription['expiry_date']}`\n\n\n"
-                )
-                await bot_instance.send_message(
-                    chat_id=user_id,
-                    text=response
-                )
-                return
+    # Idempotency keys of the notifications below, a redelivered join request doesn't notify twice
+    request_key = f"{channel_id}:{user_id}:{int(message.date.timestamp())}"
 
-            # Check if there is a pending request for this user in the current channel
-            pending_exists, admin_id = check_pending_request(session, user_id, channel_id)
-            if pending_exists:
-                LOGGER.info(f"User {user_id} has a pending request for channel/group {channel_id}. Accepting the request.")
-                # Accepting the join request
-                await client.approve_chat_join_request(channel_id, user_id)
-
-                add_subscription(session, user_id, channel_id, days=30)
-
-                # Delete pending request after adding the user
-                delete_pending_request(session, user_id, channel_id)
-                
-                # # Get the channel's invite link and revoke it (Pyrogram)
-                # old_link = get_channel_link(session, channel_id)
-                # try:
-                #     await client.revoke_chat_invite_link(channel_id, old_link)
-                #     LOGGER.info(f"Revoked old invite link for channel/group {channel_id}")
-                # except Exception as e:
-                #     LOGGER.error(f"Error revoking old link: {e}")
-                
-                # # Generate a new invite link
-                # new_link = await client.create_chat_invite_link(channel_id, creates_join_request=True)
-                # LOGGER.info(f"New invite link created for channel/group {channel_id}")
-                
-                # # Update the link in the database
-                # update_channel_link(session, channel_id, new_link.invite_link)
-
-                subscription = get_user_subscription(session, user_id, channel_id)
-                if subscription is None:
-                    LOGGER.error("Even after adding new user subscription, was unable to fetch subswcription at check_join_request.")
-                    return
-                response = (
-                    f"- - - User Subscription info - - -\n"
-                    f"👤 {get_user_mention(session,user_id)}\n\n"
-                    f"✨ {get_channel_mention(session,channel_id)}\n\n"
-                    f"📅 Expires: `{subscription['expiry_date']}`\n\n\n"
-                )
+    async with get_async_db() as session:
+        # Subscription, pending request and display names in a single query
+        context = await load_join_context_async(session, user_id, channel_id)
+        if context is None:
+            LOGGER.info(f"Join request for unknown channel/group {channel_id}. Doing nothing.")
+            return
+        user_mention = context['user_mention']
+        channel_mention = context['channel_mention']
 
-                # Send a confirmation message to the admin about the successful user addition
-                bot_instance = await get_bot_instance()
+        # Check if the join request is from a user who mistakenly left the group and still has a subscription running
+        if context['expiry_date'] is not None:
+            await client.approve_chat_join_request(channel_id, user_id)
+            mark_approved()
 
-                user_message_text = (
-                    f"🎉 You have been successfully added to {get_channel_mention(session,channel_id)}.\n\n"
-                    f"😊 Wishing you all the best for what lies ahead.\n\n"
-                )
-                await bot_instance.send_message(
-                    chat_id=user_id,
-                    text=user_message_text
-                )
-                # to user
-                await bot_instance.send_message(
-                    chat_id=user_id,
-                    text=response
-                )
-                await bot_instance.send_message(
-                    chat_id=admin_id,
-                    text=response
-                )
-
-                admin_message_text = (
-                    f"🎉 User {get_user_mention(session, user_id)} has been successfully added to the group/channel {get_channel_mention(session,channel_id)}.\n\n"
-                    f"✅ The user has been subscribed for 30 days by default.\n\n"
-                    "Would you like to edit this subscription? You can either:\n"
-                    "1. Change the duration\n"
-                    "2. Remove the subscription (kick the user).\n\n"
-                    "Please choose an action by clicking one of the options below."
-                )
+            user_warn_text = (
+                f"🎉 You have been successfully accepted to {channel_mention}.\n\n"
+                f"😊 Please don't leave us when you still have an active subscription.\n\n"
+            )
+            response = (
+                f"- - - User Subscription info - - -\n"
+                f"👤 {user_mention}\n\n"
+                f"✨ {channel_mention}\n\n"
+                f"📅 Expires: `{context['expiry_date']}`\n\n\n"
+            )
+            await enqueue_notifications_async(session, [
+                (user_id, user_warn_text, f"rejoin:{request_key}:user-welcome", None),
+                (user_id, response, f"rejoin:{request_key}:user-info", None),
+            ])
+            await session.commit()
+            wake_dispatcher()
+            return
 
-                edit_new_user_keyboard = InlineKeyboardMarkup([
-                    [InlineKeyboardButton("Edit Subscription", callback_data=f"editsub_{user_id}_{channel_id}")],
-                    [InlineKeyboardButton("Close", callback_data=f"updateNotNeeded_{user_id}_{channel_id}")]
-                ])
-                
-                # Send message to the admin with buttons
-                await bot_instance.send_message(
-                    chat_id=admin_id,
-                    text=admin_message_text,
-                    reply_markup=edit_new_user_keyboard
-                )
-                
-                LOGGER.info(f"Admin {admin_id} has been notified about the user addition.")
+        # Check if there is a pending request for this user in the current channel
+        if context['pending_admin_id'] is not None:
+            LOGGER.info(f"User {user_id} has a pending request for channel/group {channel_id}. Accepting the request.")
+            # Pending request -> 30 day subscription first, the user is only let in once that worked.
+            # Committed below together with the notifications, a failed approval rolls it back
+            promoted = await promote_pending_request_async(session, user_id, channel_id, days=30)
+            if promoted is None:
+                await session.rollback()
+                await client.decline_chat_join_request(channel_id, user_id)
+                LOGGER.error(f"Declined join request of user {user_id} in channel/group {channel_id}: the pending request could not be promoted, its admin no longer owns the channel or it was already handled.")
                 return
-            else:
-                LOGGER.info(f"No pending request for user {user_id} in channel/group {channel_id}. Doing nothing.")
+            admin_id = promoted['admin_id']
 
+            # Accepting the join request
+            await client.approve_chat_join_request(channel_id, user_id)
+            mark_approved()
+            
+            # # Get the channel's invite link and revoke it (Pyrogram)
+            # old_link = get_channel_link(session, channel_id)
+            # try:
+            #     await client.revoke_chat_invite_link(channel_id, old_link)
+            #     LOGGER.info(f"Revoked old invite link for channel/group {channel_id}")
+            # except Exception as e:
+            #     LOGGER.error(f"Error revoking old link: {e}")
             
+            # # Generate a new invite link
+            # new_link = await client.create_chat_invite_link(channel_id, creates_join_request=True)
+            # LOGGER.info(f"New invite link created for channel/group {channel_id}")
+            
+            # # Update the link in the database
+            # update_channel_link(session, channel_id, new_link.invite_link)
+
+            response = (
+                f"- - - User Subscription info - - -\n"
+                f"👤 {user_mention}\n\n"
+                f"✨ {channel_mention}\n\n"
+                f"📅 Expires: `{promoted['expiry_date']}`\n\n\n"
+            )
 
+            user_message_text = (
+                f"🎉 You have been successfully added to {channel_mention}.\n\n"
+                f"😊 Wishing you all the best for what lies ahead.\n\n"
+            )
 
-    except Exception as e:
-        LOGGER.error(f"Error in check_join_request: {e}")
+            admin_message_text = (
+                f"🎉 User {user_mention} has been successfully added to the group/channel {channel_mention}.\n\n"
+                f"✅ The user has been subscribed for 30 days by default.\n\n"
+                "Would you like to edit this subscription? You can either:\n"
+                "1. Change the duration\n"
+                "2. Remove the subscription (kick the user).\n\n"
+                "Please choose an action by clicking one of the options below."
+            )
+
+            # Same layout as an InlineKeyboardMarkup, rows of [text, callback_data]
+            edit_new_user_buttons = [
+                [["Edit Subscription", f"editsub_{user_id}_{channel_id}"]],
+                [["Close", f"updateNotNeeded_{user_id}_{channel_id}"]]
+            ]
+
+            # Confirmations to the user and the admin are committed together with the promotion
+            await enqueue_notifications_async(session, [
+                (user_id, user_message_text, f"join:{request_key}:user-welcome", None),
+                (user_id, response, f"join:{request_key}:user-info", None),
+                (admin_id, response, f"join:{request_key}:admin-info", None),
+                (admin_id, admin_message_text, f"join:{request_key}:admin-edit", edit_new_user_buttons),
+            ])
+            await session.commit()
+            wake_dispatcher()
+            LOGGER.info(f"Admin {admin_id} notification about the user addition has been enqueued.")
+            return
+        else:
+            LOGGER.info(f"No pending request for user {user_id} in channel/group {channel_id}. Doing nothing.")
+
+
+JOIN_REQUEST_QUEUE.set_processor(process_join_request)
 
 
 # Callback handler for the "Edit Subscription" button
@@ -420,9 +449,8 @@ async def delete_multiple_links(client: Client, message: Message):
             # Handle known exceptions, such as invalid links
             results +=f"Failed for link: {link} - BadRequest: {e}"
         except FloodWait as e:
-            # Handle flood wait (we wait for the required time, then continue)
-            results +=f"FloodWait for link: {link} - Waiting for {e.value} seconds"
-            await asyncio.sleep(e.value)
+            # Still rate limited after the API governor's retries
+            results +=f"FloodWait for link: {link} - Retry in {e.value} seconds\n"
         except Exception as e:
             # Catch any other errors, log them, and continue
             results.append(f"Error for link: {link} - {str(e)}")
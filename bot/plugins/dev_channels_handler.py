@@ -2,9 +2,17 @@ from bot import Bot
 from pyrogram import Client, filters
 from pyrogram.enums import ParseMode
 from pyrogram.types import Message
-from db.connection import get_db
-from db.channel_helpers import add_channel, delete_channel, get_all_channels
+from db.connection import get_db, sync_pool_metrics
+from db.async_connection import async_pool_metrics
+from db.executor import db_executor_stats, run_db
+from db.kick_retry_helpers import kick_retry_stats
+from db.user_helpers import user_cache_stats
+from db.channel_helpers import add_channel, delete_channel, get_all_channels, channel_cache_stats
 from helpers.filters import devs_filter
+from helpers.api_governor import API_GOVERNOR
+from helpers.bot_privileges import BOT_PRIVILEGES
+from helpers.join_request_queue import JOIN_REQUEST_QUEUE
+from helpers.text_helper import OUTBOUND_QUEUE
 from utils.logger import LOGGER
 
 
@@ -15,6 +23,8 @@ from utils.logger import LOGGER
 DEV : /addchannel <channel_id> <channel_name>
 DEV : /listchannels
 DEV : /deletechannel <channel_id>
+DEV : /dbstats
+DEV : /apistats
 +=======================================================================================================+
 """
 
@@ -116,4 +126,56 @@ async def delete_channel_handler(client: Client, message: Message):
         await message.reply_text("❌ Invalid channel ID format. Please provide a numeric ID.")
     except Exception as e:
         LOGGER.error(f"Error in /deletechannel: {e}")
-        await message.reply_text("❌ An error occurred while deleting the channel. Please try again later.")
\ No newline at end of file
+        await message.reply_text("❌ An error occurred while deleting the channel. Please try again later.")
+
+# Command: /dbstats
+@Bot.on_message(filters.command("dbstats") & filters.private & devs_filter)
+async def db_stats_handler(client: Client, message: Message):
+    """
+    Handles the /dbstats command to show connection pool, db executor and cache metrics.
+    """
+    try:
+        response = "**Database Stats:**\n"
+        for title, stats in (
+            ("Sync pool", sync_pool_metrics.stats()),
+            ("Async pool", async_pool_metrics.stats()),
+            ("DB executor", db_executor_stats()),
+            ("Channel cache", channel_cache_stats()),
+            ("User cache", user_cache_stats()),
+            ("Kick retry queue", await run_db(kick_retry_stats)),
+        ):
+            response += f"\n__{title}__\n"
+            for key, value in stats.items():
+                response += f"- {key}: `{round(value, 1) if isinstance(value, float) else value}`\n"
+
+        await message.reply_text(response)
+
+    except Exception as e:
+        LOGGER.error(f"Error in /dbstats: {e}")
+        await message.reply_text("❌ An error occurred while collecting database stats.")
+
+# Command: /apistats
+@Bot.on_message(filters.command("apistats") & filters.private & devs_filter)
+async def api_stats_handler(client: Client, message: Message):
+    """
+    Handles the /apistats command to show the Telegram API governor metrics.
+    """
+    try:
+        response = "**Telegram API Stats:**\n"
+        for key, value in API_GOVERNOR.stats().items():
+            response += f"- {key}: `{round(value, 1) if isinstance(value, float) else value}`\n"
+        response += "\n__Outbound queue__\n"
+        for key, value in OUTBOUND_QUEUE.stats().items():
+            response += f"- {key}: `{value}`\n"
+        response += "\n__Join request queue__\n"
+        for key, value in JOIN_REQUEST_QUEUE.stats().items():
+            response += f"- {key}: `{value}`\n"
+        response += "\n__Bot privileges cache__\n"
+        for key, value in BOT_PRIVILEGES.stats().items():
+            response += f"- {key}: `{value}`\n"
+
+        await message.reply_text(response)
+
+    except Exception as e:
+        LOGGER.error(f"Error in /apistats: {e}")
+        await message.reply_text("❌ An error occurred while collecting API stats.")
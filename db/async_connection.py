@@ -0,0 +1,91 @@
+import ssl
+import threading
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import StaticPool
+from utils.config import Config
+from db.pool_metrics import PoolMetrics, InstrumentedAsyncQueuePool, pool_options, instrument_engine
+
+# Build the PostgreSQL URL for the asyncpg driver
+ASYNC_DB_URL = (
+    f"postgresql+asyncpg://{Config.DB_USER}:{Config.DB_PASS}@"
+    f"{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_DATABASE}"
+)
+
+# Async session factory, bound to the engine by init_async_db().
+# Objects stay usable after commit since handlers read them afterwards
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Checkout/connect counters of the async pool, attached to the engine by init_async_db()
+async_pool_metrics = PoolMetrics("async")
+
+# Like the sync engine, nothing is created until first use
+_async_engine = None
+_init_lock = threading.Lock()
+
+
+def _to_async_url(url: str) -> str:
+    """
+    The async driver form of a sync URL (e.g. DB_URL_OVERRIDE, which is shared with the sync engine).
+    PostgreSQL goes to asyncpg, libpq's sslmode/sslrootcert are dropped as SSL is configured by the SSL context below.
+    SQLite goes to aiosqlite and must be a file, each engine would get its own in-memory database otherwise.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode", "sslrootcert"])
+    elif backend == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            raise ValueError("DB_URL_OVERRIDE must be a SQLite file (e.g. sqlite:///bot.db), not an in-memory database")
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+def _create_async_engine(url: str):
+    if url.startswith("sqlite"):
+        # Stand-in database, e.g. sqlite+aiosqlite:///bot.db
+        return create_async_engine(url, poolclass=StaticPool)
+
+    # asyncpg does not understand libpq's sslmode/sslrootcert query parameters,
+    # so verify-full is expressed as an SSL context (CA check + hostname check)
+    ssl_context = ssl.create_default_context(cafile=Config.CA_CERT_PATH)
+
+    # Same pool tuning as the sync engine
+    engine = create_async_engine(
+        url,
+        connect_args={"ssl": ssl_context},
+        **pool_options(InstrumentedAsyncQueuePool),
+    )
+    instrument_engine(engine, async_pool_metrics)
+    return engine
+
+
+def init_async_db(url: str = None):
+    """
+    Build the async engine and bind AsyncSessionLocal, once.
+    Schema setup is left to the sync init_db(), both engines point at the same database.
+
+    Args:
+        url: Engine URL, defaults to DB_URL_OVERRIDE (same database as init_db) or the PostgreSQL settings from Config.
+    """
+    global _async_engine
+    if _async_engine is not None:
+        return _async_engine
+    with _init_lock:
+        if _async_engine is None:
+            if url is None:
+                url = _to_async_url(Config.DB_URL_OVERRIDE) if Config.DB_URL_OVERRIDE else ASYNC_DB_URL
+            engine = _create_async_engine(url)
+            AsyncSessionLocal.configure(bind=engine)
+            _async_engine = engine
+    return _async_engine
+
+
+def get_async_db() -> AsyncSession:
+    """
+    Provide an async session for database interaction.
+    Usage - async with get_async_db() as session: ...
+    """
+    if _async_engine is None:
+        init_async_db()
+    return AsyncSessionLocal()
@@ -2,14 +2,45 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, delete, func
 from datetime import datetime, timedelta
 from db.models import Channel, Subscription
-from db.user_helpers import remove_extra_users
+from db.user_helpers import remove_orphaned_users
+from db.cache import TTLCache
+from utils.config import Config
 from utils.logger import LOGGER
 
+# Read-through cache of channel rows keyed by channel_id, every writer below invalidates its entry
+CHANNEL_CACHE = TTLCache("channels", maxsize=Config.CHANNEL_CACHE_SIZE, ttl=Config.CHANNEL_CACHE_TTL)
+
+def _channel_to_dict(channel: Channel) -> dict:
+    return {
+        "channel_id": channel.channel_id,
+        "channel_name": channel.channel_name,
+        "invite_link": channel.invite_link,
+        "is_channel": channel.is_channel,
+    }
+
+def get_cached_channel(session: Session, channel_id: int) -> dict | None:
+    """Returns the channel row as a dict, from CHANNEL_CACHE when possible."""
+    channel = CHANNEL_CACHE.get(channel_id)
+    if channel is None:
+        row = session.query(Channel).filter(Channel.channel_id == channel_id).first()
+        if row is None:
+            return None
+        channel = _channel_to_dict(row)
+        CHANNEL_CACHE.set(channel_id, channel)
+    return channel
+
+def channel_cache_stats() -> dict:
+    return CHANNEL_CACHE.stats()
+
+def format_channel_mention(channel_id: int, channel_name: str) -> str:
+    channel_value = str(channel_id).lstrip('-100')
+    return f"[{channel_name}](https://t.me/c/{channel_value})"
+
 def get_channel_link(session: Session, channel_id: int) -> str:
     try:
-        channel = session.query(Channel).filter(Channel.channel_id == channel_id).first()
+        channel = get_cached_channel(session, channel_id)
         if channel:
-            return channel.invite_link
+            return channel["invite_link"]
         else:
             return None  # Return None if the channel is not found
     except Exception as e:
@@ -23,6 +54,7 @@ def update_channel_link(session: Session, channel_id: int, new_link: str) -> boo
         if channel:
             channel.invite_link = new_link
             session.commit()
+            CHANNEL_CACHE.invalidate(channel_id)
             return True  # Successfully updated the link
         else:
             return False  # Channel not found
@@ -40,6 +72,7 @@ def add_channel(session: Session, channel_id: int, channel_name: str, is_channel
             channel = Channel(channel_id=channel_id, channel_name=channel_name, is_channel=is_channel)
             session.add(channel)
             session.commit()
+            CHANNEL_CACHE.invalidate(channel_id)
             LOGGER.info(f"Created a new channel {channel_id}")
         return channel
     except Exception as e:
@@ -48,21 +81,19 @@ def add_channel(session: Session, channel_id: int, channel_name: str, is_channel
         return None
 
 def get_channel_name_by_id(session: Session, channel_id: int):
-    channel = session.query(Channel).filter(Channel.channel_id == channel_id).first()
+    channel = get_cached_channel(session, channel_id)
     if channel:
-        return channel.channel_name + 'ᶜ' if channel.is_channel else 'ᴳ'
+        return channel["channel_name"] + 'ᶜ' if channel["is_channel"] else 'ᴳ'
     else:
         LOGGER.info(f"No channel with channel id - {channel_id} found in the database.")
         return None
 
 def get_channel_mention(session: Session, channel_id: int) -> str | None:
     try:
-        channel = session.query(Channel).filter(Channel.channel_id == channel_id).one_or_none()
+        channel = get_cached_channel(session, channel_id)
 
         if channel:
-            channel_value = str(channel_id).lstrip('-100')
-            mention = f"[{channel.channel_name}](https://t.me/c/{channel_value})"
-            return mention
+            return format_channel_mention(channel_id, channel['channel_name'])
         else:
             return None
 
@@ -95,16 +126,19 @@ def delete_channel(session: Session, channel_id: int):
             LOGGER.warning(f"Channel {channel_id} not found in the database.")
             return False
         
-        # Step 1: Delete all subscriptions related to the channel
-        session.query(Subscription).filter(Subscription.channel_id == channel_id).delete()
+        # Step 1: Delete all subscriptions related to the channel, remembering whose they were
+        affected_user_ids = session.execute(
+            delete(Subscription).where(Subscription.channel_id == channel_id).returning(Subscription.user_id)
+        ).scalars().all()
         session.commit()
 
         # Step 2: Delete the channel itself
         session.query(Channel).filter(Channel.channel_id == channel_id).delete()
         session.commit()
+        CHANNEL_CACHE.invalidate(channel_id)
 
-        # Step 3: Remove orphaned users
-        remove_extra_users(session)
+        # Step 3: Remove users of this channel who are now orphaned
+        remove_orphaned_users(session, affected_user_ids)
         return True
     except Exception as e:
         session.rollback()
@@ -133,6 +167,7 @@ def add_or_update_channel_connection(session: Session, channel_id: int, channel_
 
         # Commit the transaction
         session.commit()
+        CHANNEL_CACHE.invalidate(channel_id)
         return True
     except Exception as e:
         # Rollback in case of an error
@@ -147,6 +182,7 @@ def set_invite_link(session: Session, channel_id: int, invite_link: str) -> bool
         if channel:
             channel.invite_link = invite_link
             session.commit()
+            CHANNEL_CACHE.invalidate(channel_id)
             return True
         return False
     except Exception as e:
@@ -155,8 +191,8 @@ def set_invite_link(session: Session, channel_id: int, invite_link: str) -> bool
 
 def get_invite_link(session, channel_id: int) -> str | None:
     try:
-        channel = session.query(Channel).filter(Channel.channel_id == channel_id).first()
-        return channel.invite_link if channel else None
+        channel = get_cached_channel(session, channel_id)
+        return channel["invite_link"] if channel else None
     except Exception as e:
         LOGGER.error(f"Error deleting channel link {channel_id}: {e}")
         return False
@@ -167,8 +203,9 @@ def delete_invite_link(session: Session, channel_id: int) -> bool:
         if channel and channel.invite_link is not None:
             channel.invite_link = None
             session.commit()
+            CHANNEL_CACHE.invalidate(channel_id)
             return True
         return False
     except Exception as e:
         LOGGER.error(f"Error deleting channel link {channel_id}: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
 from utils.config import Config
+from utils.logger import LOGGER
 from db.initialize import initialize_database
+from db.pool_metrics import PoolMetrics, InstrumentedQueuePool, pool_options, instrument_engine
+import threading
+import time
 
 # Database connection settings
 DB_CONFIG = {
@@ -21,27 +26,96 @@ DB_URL = (
     f"sslmode={DB_CONFIG['sslmode']}&sslrootcert={DB_CONFIG['sslrootcert']}"
 )
 
-# Initialize SQLAlchemy engine
-engine = create_engine(DB_URL, pool_pre_ping=True)
-
-
 # Base class for ORM models
 Base = declarative_base()
 
 # Import models to register them with Base ---- Or can place this in initialize.py and remove from here
 from db.models import Channel, User, Subscription, VerificationCode  # Import all models
 
+# Session factory, bound to the engine by init_db()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Checkout/connect counters of the sync pool, attached to the engine by init_db()
+sync_pool_metrics = PoolMetrics("sync")
+
+# Nothing connects to the database at import time, the engine is built on first use
+_engine = None
+_init_lock = threading.Lock()
+
+
+def _create_engine(url: str):
+    if url.startswith("sqlite"):
+        # In-process stand-in (tests, local runs): one shared connection so an in-memory db survives
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    # An override URL without its own SSL parameters still gets verify-full against our CA
+    connect_args = {}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql" and "sslmode" not in parsed.query:
+        connect_args = {"sslmode": DB_CONFIG["sslmode"], "sslrootcert": DB_CONFIG["sslrootcert"]}
+
+    # Pool sizing/recycling/pre-ping come from Config
+    engine = create_engine(url, connect_args=connect_args, **pool_options(InstrumentedQueuePool))
+    instrument_engine(engine, sync_pool_metrics)
+    return engine
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Initialize the database when the module is imported
-initialize_database(engine, Base)
+def init_db(url: str = None, initialize: bool = True):
+    """
+    Build the engine, bind SessionLocal and initialize the database, once.
+    Called explicitly at startup by main.py, otherwise on the first get_db().
+
+    Args:
+        url: Engine URL, defaults to DB_URL_OVERRIDE or the PostgreSQL settings from Config.
+             e.g. init_db("sqlite://") for an in-memory stand-in.
+        initialize: Run initialize_database (schema check, create_all, migrations).
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _init_lock:
+        if _engine is None:
+            started = time.perf_counter()
+            engine = _create_engine(url or Config.DB_URL_OVERRIDE or DB_URL)
+            if initialize:
+                initialize_database(engine, Base)
+            SessionLocal.configure(bind=engine)
+            _engine = engine
+            LOGGER.info(f"Database engine ready ({engine.dialect.name}) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return _engine
+
+
+def get_engine():
+    """The engine, built on first call."""
+    return _engine if _engine is not None else init_db()
+
 
 def get_db():
     """Provide a session for database interaction."""
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def prewarm_pool(count: int = Config.DB_POOL_PREWARM):
+    """
+    Open `count` connections up front (capped at the pool size) and return them to the pool,
+    so the first updates after startup don't pay for the SSL handshake.
+    """
+    engine = get_engine()
+    count = min(count, Config.DB_POOL_SIZE)
+    if count <= 0 or engine.dialect.name == "sqlite":
+        return
+    started = time.perf_counter()
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    except Exception as e:
+        LOGGER.error(f"Error pre-warming connection pool: {e}")
+    finally:
+        for connection in connections:
+            connection.close()
+    LOGGER.info(f"Pre-warmed {len(connections)} DB connections in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from db.connection import get_db
+from utils.config import Config
+from utils.logger import LOGGER
+
+# One worker per pooled connection, so a queued call waits for a thread instead of
+# holding a thread while it waits for a connection
+DB_EXECUTOR_WORKERS = Config.DB_POOL_SIZE
+
+# Calls that wait longer than this for a worker are logged as pool saturation
+SLOW_WAIT_WARNING_SECONDS = 1.0
+
+
+class DBExecutor:
+    """
+    Bounded thread pool that runs blocking SQLAlchemy work off the event loop.
+
+    Tracks how many calls are queued behind busy workers and how long they waited,
+    so saturation of the connection pool shows up in the logs and in stats().
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _run(self, submitted_at: float, func, args, kwargs):
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            queued = self._queued
+
+        if waited > SLOW_WAIT_WARNING_SECONDS:
+            LOGGER.warning(
+                f"DB executor saturated: {getattr(func, '__name__', func)} waited {waited:.2f}s "
+                f"for a worker ({queued} still queued, {self.max_workers} workers)"
+            )
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    async def submit(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the executor and await its result."""
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._run, time.monotonic(), func, args, kwargs
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._in_flight
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "avg_wait_ms": (self._total_wait / started * 1000) if started else 0.0,
+                "max_wait_ms": self._max_wait * 1000,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+DB_EXECUTOR = DBExecutor(DB_EXECUTOR_WORKERS)
+
+
+def _with_session(func, args, kwargs):
+    with next(get_db()) as session:
+        return func(session, *args, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run a sync db helper off the event loop with its own session.
+    Usage - await run_db(get_user_subscription, user_id, channel_id)
+    """
+    return await DB_EXECUTOR.submit(_with_session, func, args, kwargs)
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Run a blocking callable on the db executor as is.
+    For callers that already hold a session and use it one call at a time.
+    """
+    return await DB_EXECUTOR.submit(func, *args, **kwargs)
+
+
+def db_executor_stats() -> dict:
+    """Queue depth, in-flight calls and wait times of the db executor."""
+    return DB_EXECUTOR.stats()
@@ -1,32 +1,60 @@
+import logging
+import time
+from sqlalchemy import inspect
 from sqlalchemy.exc import SQLAlchemyError
 from utils.logger import LOGGER
+from db.migrations import run_migrations, get_schema_version, LATEST_VERSION
+
+
+def schema_is_current(engine) -> bool:
+    """
+    Cheap startup check: a catalog lookup for `schema_version`, then one query for its highest version.
+    (A single statement can't do both, Postgres rejects a query naming a table that doesn't exist yet.)
+    True when the database is already at LATEST_VERSION, so create_all and the migration runner can be skipped.
+    """
+    with engine.connect() as connection:
+        if not inspect(connection).has_table("schema_version"):
+            return False
+        return get_schema_version(connection) >= LATEST_VERSION
 
 
 def initialize_database(engine, Base):
     """
     Initializes the database by creating all tables defined in the models
-    if they do not already exist.
-    Displays the list of tables and their definitions after initialization.
+    if they do not already exist, then applies pending migrations.
+    Skips all DDL when the stored schema version is already current.
+    Displays the list of tables and their definitions when debug logging is on.
     """
     try:
         LOGGER.info("Initializing the database...")
-        
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        
+        started = time.perf_counter()
+
+        if engine.dialect.name != "postgresql":
+            # Stand-in databases (sqlite) only get the tables, the migrations are PostgreSQL specific
+            Base.metadata.create_all(bind=engine)
+        elif schema_is_current(engine):
+            LOGGER.info(f"Database schema is at version {LATEST_VERSION}, skipping create_all and migrations.")
+        else:
+            # Create all tables
+            Base.metadata.create_all(bind=engine)
+
+            # Apply schema changes to existing tables (indexes etc.)
+            run_migrations(engine)
+
+        LOGGER.info(f"Database initialization complete in {(time.perf_counter() - started) * 1000:.0f} ms. All tables are up-to-date.")
+
         # Log the list of tables and their definitions
-        LOGGER.info("Database initialization complete. All tables are up-to-date.")
-        LOGGER.info("Current tables in the database:")
-        
-        for table_name, table in Base.metadata.tables.items():
-            LOGGER.info(f"Table: {table_name}")
-            LOGGER.info(f"Columns:")
-            for column in table.columns:
-                LOGGER.info(
-                    f" - {column.name} ({column.type}) "
-                    f"{'PRIMARY KEY' if column.primary_key else ''}"
-                )
-            LOGGER.info("\n")
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("Current tables in the database:")
+            for table_name, table in Base.metadata.tables.items():
+                LOGGER.debug(f"Table: {table_name}")
+                LOGGER.debug(f"Columns:")
+                for column in table.columns:
+                    LOGGER.debug(
+                        f" - {column.name} ({column.type}) "
+                        f"{'PRIMARY KEY' if column.primary_key else ''}"
+                    )
+                LOGGER.debug("\n")
 
     except SQLAlchemyError as e:
         LOGGER.error(f"Database initialization failed: {e}")
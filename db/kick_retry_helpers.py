@@ -0,0 +1,209 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import timedelta
+from db.models import KickRetry, KickRetryChannel, Subscription
+from utils.logger import LOGGER
+
+# Delay before a channel's next retry round doubles with each failed round, capped
+KICK_RETRY_BASE = timedelta(minutes=5)
+KICK_RETRY_MAX = timedelta(hours=24)
+
+# A claimed channel is not handed out again for this long, in case the retry round dies midway
+KICK_RETRY_LEASE = timedelta(minutes=10)
+
+
+def kick_retry_delay(failures: int) -> timedelta:
+    return min(KICK_RETRY_BASE * (2 ** max(failures - 1, 0)), KICK_RETRY_MAX)
+
+def enqueue_kick_retries(session: Session, failures: list) -> int:
+    """
+    Queues expired members whose removal failed, e.g. from an expiry run.
+    A channel new to the queue gets its first retry after KICK_RETRY_BASE, a channel already
+    in it keeps its backoff.
+
+    Args:
+        failures (list): (subscription, error message) pairs, subscriptions as returned by claim_expired_subscriptions
+
+    Returns:
+        int: Number of members queued
+    """
+    if not failures:
+        return 0
+    last_error_by_channel = {subscription['channel_id']: error for subscription, error in failures}
+    try:
+        # DO UPDATE rather than DO NOTHING: it locks the channel row (serialising with complete_kick_retries),
+        # and if that round deleted the row meanwhile the insert is retried instead of leaving members without a channel
+        queued_channels = pg_insert(KickRetryChannel)
+        session.execute(
+            queued_channels
+            .values([
+                {
+                    'channel_id': channel_id,
+                    'failures': 1,
+                    'next_attempt_at': func.now() + KICK_RETRY_BASE,
+                    'last_error': error[:1000],
+                }
+                for channel_id, error in last_error_by_channel.items()
+            ])
+            .on_conflict_do_update(
+                index_elements=['channel_id'],
+                set_={'last_error': queued_channels.excluded.last_error}
+            )
+        )
+        inserted = pg_insert(KickRetry).values([
+            {
+                'user_id': subscription['user_id'],
+                'channel_id': subscription['channel_id'],
+                'user_fullname': subscription['user_fullname'],
+                'expiry_date': subscription['expiry_date'],
+                'last_error': error[:1000],
+            }
+            for subscription, error in failures
+        ])
+        session.execute(
+            inserted.on_conflict_do_update(
+                index_elements=['user_id', 'channel_id'],
+                set_={'last_error': inserted.excluded.last_error}
+            )
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error queueing {len(failures)} failed removals for retry: {e}")
+        raise
+    LOGGER.info(f"Queued {len(failures)} failed removals in {len(last_error_by_channel)} channels for retry")
+    return len(failures)
+
+def claim_kick_retry_channels(session: Session, channel_id: int = None, limit: int = 50) -> list:
+    """
+    Leases the channels whose retry round is due (FOR UPDATE SKIP LOCKED), or just `channel_id` if given.
+
+    Returns:
+        List[Dict]: channel_id and failures of each claimed channel
+    """
+    due = (
+        select(KickRetryChannel.channel_id)
+        .where(KickRetryChannel.next_attempt_at <= func.now())
+        .order_by(KickRetryChannel.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if channel_id is not None:
+        due = due.where(KickRetryChannel.channel_id == channel_id)
+    try:
+        rows = session.execute(
+            update(KickRetryChannel)
+            .where(KickRetryChannel.channel_id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=func.now() + KICK_RETRY_LEASE)
+            .returning(KickRetryChannel.channel_id, KickRetryChannel.failures)
+        ).all()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error claiming kick retry channels: {e}")
+        raise
+    return [row._asdict() for row in rows]
+
+def load_kick_retries(session: Session, channel_id: int) -> list:
+    """
+    The channel's queued members, shaped like claimed subscriptions. Members who got a subscription
+    to the channel again in the meantime (renewed, re-approved) are dropped from the queue instead.
+    """
+    try:
+        renewed = session.execute(
+            delete(KickRetry)
+            .where(
+                KickRetry.channel_id == channel_id,
+                select(Subscription.subscription_id)
+                .where(and_(Subscription.user_id == KickRetry.user_id, Subscription.channel_id == KickRetry.channel_id))
+                .exists()
+            )
+        ).rowcount
+        rows = session.execute(
+            select(KickRetry.user_id, KickRetry.channel_id, KickRetry.user_fullname, KickRetry.expiry_date)
+            .where(KickRetry.channel_id == channel_id)
+            .order_by(KickRetry.expiry_date, KickRetry.user_id)
+        ).all()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error loading kick retries of channel {channel_id}: {e}")
+        raise
+    if renewed:
+        LOGGER.info(f"Dropped {renewed} queued removals in channel {channel_id}, those members are subscribed again")
+    return [row._asdict() for row in rows]
+
+def complete_kick_retries(session: Session, channel_id: int, removed_user_ids: list, error: str = None) -> int:
+    """
+    Ends a channel's retry round: removed members leave the queue. When nothing is left the channel
+    leaves it too, after a failed round (`error`) its backoff grows, otherwise it is due again right away.
+
+    Returns:
+        int: Members still queued for the channel
+    """
+    try:
+        # Lock the channel row first: members enqueued concurrently either commit before the count below
+        # or wait until this round is over, so the channel is never dropped with members still queued
+        session.execute(
+            select(KickRetryChannel.channel_id).where(KickRetryChannel.channel_id == channel_id).with_for_update()
+        )
+        if removed_user_ids:
+            session.execute(
+                delete(KickRetry).where(KickRetry.channel_id == channel_id, KickRetry.user_id.in_(removed_user_ids))
+            )
+        remaining = session.execute(
+            select(func.count()).select_from(KickRetry).where(KickRetry.channel_id == channel_id)
+        ).scalar()
+
+        if remaining == 0:
+            session.execute(delete(KickRetryChannel).where(KickRetryChannel.channel_id == channel_id))
+        elif error is not None:
+            failures = session.execute(
+                select(KickRetryChannel.failures).where(KickRetryChannel.channel_id == channel_id)
+            ).scalar() or 0
+            session.execute(
+                update(KickRetryChannel)
+                .where(KickRetryChannel.channel_id == channel_id)
+                .values(
+                    failures=failures + 1,
+                    next_attempt_at=func.now() + kick_retry_delay(failures + 1),
+                    last_error=error[:1000]
+                )
+            )
+        else:
+            session.execute(
+                update(KickRetryChannel)
+                .where(KickRetryChannel.channel_id == channel_id)
+                .values(failures=0, next_attempt_at=func.now(), last_error=None)
+            )
+        session.commit()
+        return remaining
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error completing kick retries of channel {channel_id}: {e}")
+        raise
+
+def resume_kick_retries(session: Session, channel_id: int) -> bool:
+    """Makes a backed-off channel due now, e.g. once the bot is admin there again. False if nothing is queued for it."""
+    try:
+        resumed = session.execute(
+            update(KickRetryChannel)
+            .where(KickRetryChannel.channel_id == channel_id)
+            .values(failures=0, next_attempt_at=func.now())
+        ).rowcount
+        session.commit()
+        return resumed > 0
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error resuming kick retries of channel {channel_id}: {e}")
+        return False
+
+def kick_retry_stats(session: Session) -> dict:
+    channels, members = session.execute(
+        select(
+            select(func.count()).select_from(KickRetryChannel).scalar_subquery(),
+            select(func.count()).select_from(KickRetry).scalar_subquery()
+        )
+    ).one()
+    return {"channels": channels, "members": members}
@@ -0,0 +1,193 @@
+import re
+from sqlalchemy import text
+from utils.logger import LOGGER
+
+"""
+Versioned schema migrations for db/models.py.
+
+create_all only creates missing tables, so every change to an existing table goes here
+as a new entry with the next version number. Entries run in order, each one is recorded
+in `schema_version` once applied. Keep models.py in sync so fresh databases created by
+create_all end up with the same schema (statements must therefore be idempotent).
+
+Set "concurrent": True for CREATE/DROP INDEX CONCURRENTLY, those statements run outside
+a transaction so the table stays writable while the index is built.
+"""
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "Index subscriptions on (channel_id, expiry_date) for per-admin expiry queries",
+        "concurrent": True,
+        "statements": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_channel_expiry ON subscriptions (channel_id, expiry_date)",
+        ],
+    },
+    {
+        "version": 2,
+        "description": "Index subscriptions on (channel_id, user_id) for keyset paging of channel members",
+        "concurrent": True,
+        "statements": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_channel_user ON subscriptions (channel_id, user_id)",
+        ],
+    },
+    {
+        "version": 3,
+        "description": "Index pending_requests on admin_id",
+        "concurrent": True,
+        "statements": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pending_requests_admin_id ON pending_requests (admin_id)",
+        ],
+    },
+    {
+        "version": 4,
+        "description": "Notification outbox drained by the background dispatcher",
+        "concurrent": False,
+        "statements": [
+            "CREATE TABLE IF NOT EXISTS notification_outbox ("
+            " id BIGSERIAL PRIMARY KEY,"
+            " idempotency_key VARCHAR NOT NULL UNIQUE,"
+            " chat_id BIGINT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " buttons JSON,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error VARCHAR,"
+            " next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),"
+            " created_at TIMESTAMP DEFAULT now(),"
+            " sent_at TIMESTAMP"
+            ")",
+            "CREATE INDEX IF NOT EXISTS ix_outbox_due ON notification_outbox (next_attempt_at) WHERE sent_at IS NULL",
+        ],
+    },
+    {
+        "version": 5,
+        "description": "Checkpoints of unfinished /scan runs",
+        "concurrent": False,
+        "statements": [
+            "CREATE TABLE IF NOT EXISTS scan_checkpoints ("
+            " channel_id BIGINT PRIMARY KEY REFERENCES channels (channel_id) ON DELETE CASCADE,"
+            " scanned INTEGER NOT NULL DEFAULT 0,"
+            " inserted INTEGER NOT NULL DEFAULT 0,"
+            " skipped INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0,"
+            " started_at TIMESTAMP DEFAULT now(),"
+            " updated_at TIMESTAMP DEFAULT now()"
+            ")",
+        ],
+    },
+    {
+        "version": 6,
+        "description": "Retry queue of expired members that could not be removed",
+        "concurrent": False,
+        "statements": [
+            "CREATE TABLE IF NOT EXISTS kick_retry_channels ("
+            " channel_id BIGINT PRIMARY KEY REFERENCES channels (channel_id) ON DELETE CASCADE,"
+            " failures INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),"
+            " last_error VARCHAR"
+            ")",
+            "CREATE INDEX IF NOT EXISTS ix_kick_retry_channels_due ON kick_retry_channels (next_attempt_at)",
+            "CREATE TABLE IF NOT EXISTS kick_retries ("
+            " user_id BIGINT NOT NULL,"
+            " channel_id BIGINT NOT NULL REFERENCES kick_retry_channels (channel_id) ON DELETE CASCADE,"
+            " user_fullname VARCHAR,"
+            " expiry_date DATE NOT NULL,"
+            " last_error VARCHAR,"
+            " created_at TIMESTAMP DEFAULT now(),"
+            " PRIMARY KEY (user_id, channel_id)"
+            ")",
+        ],
+    },
+]
+
+LATEST_VERSION = max(migration["version"] for migration in MIGRATIONS)
+
+# Arbitrary key for pg_advisory_lock, keeps two bot processes from migrating at the same time
+MIGRATION_LOCK_KEY = 72160341
+
+
+def ensure_version_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT now()"
+        ")"
+    ))
+
+
+def get_schema_version(connection) -> int:
+    """Returns the highest applied migration version, 0 for a database without migrations."""
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+# Name of the index built by a CREATE INDEX statement
+_INDEX_NAME = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?\"?(\w+)\"?", re.IGNORECASE)
+
+
+def _drop_invalid_indexes(connection, migration):
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which IF NOT EXISTS would keep.
+    Only the migration's own indexes are considered, an index being built concurrently by someone else is INVALID too.
+    """
+    index_names = [match.group(1) for statement in migration["statements"] for match in _INDEX_NAME.finditer(statement)]
+    if not index_names:
+        return
+    invalid = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE NOT i.indisvalid AND n.nspname = current_schema() AND c.relname = ANY(:names)"
+        ),
+        {"names": index_names},
+    ).scalars().all()
+    for index_name in invalid:
+        LOGGER.warning(f"Dropping invalid index {index_name} left by an interrupted build")
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+
+
+def _record_version(connection, migration):
+    connection.execute(
+        text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+        {"version": migration["version"], "description": migration["description"]},
+    )
+
+
+def _apply(engine, migration):
+    if migration["concurrent"]:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            _drop_invalid_indexes(connection, migration)
+            for statement in migration["statements"]:
+                connection.execute(text(statement))
+            _record_version(connection, migration)
+    else:
+        with engine.begin() as connection:
+            for statement in migration["statements"]:
+                connection.execute(text(statement))
+            _record_version(connection, migration)
+
+
+def run_migrations(engine) -> int:
+    """
+    Applies every migration newer than the recorded schema version, in order.
+
+    Returns:
+        int: The schema version after running
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_connection:
+        lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            ensure_version_table(lock_connection)
+            current_version = get_schema_version(lock_connection)
+
+            for migration in MIGRATIONS:
+                if migration["version"] <= current_version:
+                    continue
+                LOGGER.info(f"Applying migration {migration['version']}: {migration['description']}")
+                _apply(engine, migration)
+                current_version = migration["version"]
+
+            LOGGER.info(f"Database schema is at version {current_version}")
+            return current_version
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -1,4 +1,4 @@
-from sqlalchemy import Index, Integer, Column, Boolean, BigInteger, String, Date, DateTime, ForeignKey, UniqueConstraint , func
+from sqlalchemy import Index, Integer, Column, Boolean, BigInteger, String, Text, JSON, Date, DateTime, ForeignKey, UniqueConstraint , func
 from sqlalchemy.orm import relationship
 from db.connection import Base  # Assuming you have a Base defined in your connection module
 
@@ -63,6 +63,8 @@ class Subscription(Base):
     __table_args__ = (
         Index('idx_user_channel', 'user_id', 'channel_id', unique=True),  # Composite index for user+channel
         Index('idx_expiry_date', 'expiry_date'),
+        Index('idx_channel_expiry', 'channel_id', 'expiry_date'),  # Per-channel expiry queries (migration 1)
+        Index('idx_channel_user', 'channel_id', 'user_id'),  # Keyset paging of channel members (migration 2)
     )
 
     def __repr__(self):
@@ -109,5 +111,76 @@ class PendingRequest(Base):
     # Index on channel_id to speed up lookups
     __table_args__ = (
         Index('ix_pending_requests_channel_id', 'channel_id'),
+        Index('ix_pending_requests_admin_id', 'admin_id'),  # (migration 3)
         UniqueConstraint('user_id', 'channel_id', name='uq_user_channel'),
-    )
\ No newline at end of file
+    )
+
+
+class NotificationOutbox(Base):
+    __tablename__ = 'notification_outbox'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String, nullable=False, unique=True)  # Enqueueing the same key twice is a no-op
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    buttons = Column(JSON, nullable=True)  # Inline keyboard as rows of [text, callback_data]
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=func.now())
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    # Index for the dispatcher, only rows still to be sent (migration 4)
+    __table_args__ = (
+        Index('ix_outbox_due', 'next_attempt_at', postgresql_where=sent_at.is_(None)),
+    )
+
+    def __repr__(self):
+        return (f"<NotificationOutbox(id={self.id}, chat_id={self.chat_id}, "
+                f"attempts={self.attempts}, sent_at='{self.sent_at}')>")
+
+
+class ScanCheckpoint(Base):
+    __tablename__ = 'scan_checkpoints'
+
+    # One unfinished /scan per channel, removed once the scan completes
+    channel_id = Column(BigInteger, ForeignKey('channels.channel_id', ondelete="CASCADE"), primary_key=True)
+    scanned = Column(Integer, nullable=False, default=0)  # Members read from get_chat_members so far
+    inserted = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<ScanCheckpoint(channel_id={self.channel_id}, scanned={self.scanned})>"
+
+
+class KickRetryChannel(Base):
+    __tablename__ = 'kick_retry_channels'
+
+    # Backoff of a channel whose expired members could not all be removed; gone once its queue is empty
+    channel_id = Column(BigInteger, ForeignKey('channels.channel_id', ondelete="CASCADE"), primary_key=True)
+    failures = Column(Integer, nullable=False, default=0)  # Consecutive failed retry rounds
+    next_attempt_at = Column(DateTime, nullable=False, default=func.now())
+    last_error = Column(String, nullable=True)
+
+    # Index for the retry job, due channels first (migration 6)
+    __table_args__ = (
+        Index('ix_kick_retry_channels_due', 'next_attempt_at'),
+    )
+
+
+class KickRetry(Base):
+    __tablename__ = 'kick_retries'
+
+    # No foreign key to users, the orphan cleanup may remove the user while the kick is still pending
+    user_id = Column(BigInteger, primary_key=True)
+    channel_id = Column(BigInteger, ForeignKey('kick_retry_channels.channel_id', ondelete="CASCADE"), primary_key=True)
+    user_fullname = Column(String, nullable=True)
+    expiry_date = Column(Date, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<KickRetry(user_id={self.user_id}, channel_id={self.channel_id}, expiry_date='{self.expiry_date}')>"
@@ -0,0 +1,160 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta
+from db.models import NotificationOutbox
+from utils.logger import LOGGER
+
+# After this many failed deliveries a notification is left in the table, unsent, for inspection
+OUTBOX_MAX_ATTEMPTS = 8
+
+# A claimed notification is not handed out again for this long, in case the dispatcher dies mid-send
+OUTBOX_LEASE = timedelta(minutes=2)
+
+# Retry delay after a failed delivery doubles per attempt, capped
+OUTBOX_RETRY_BASE = timedelta(seconds=30)
+OUTBOX_RETRY_MAX = timedelta(hours=1)
+
+
+def _notification_insert(notifications: list):
+    return (
+        pg_insert(NotificationOutbox)
+        .values([
+            {"chat_id": chat_id, "text": text, "idempotency_key": idempotency_key, "buttons": buttons}
+            for chat_id, text, idempotency_key, buttons in notifications
+        ])
+        .on_conflict_do_nothing(index_elements=['idempotency_key'])
+    )
+
+def enqueue_notification(session: Session, chat_id: int, text: str, idempotency_key: str, buttons: list = None):
+    """
+    Adds a notification to the outbox within the caller's transaction, it is committed (or rolled back)
+    together with the caller's data change. A key that was already enqueued is ignored.
+
+    Args:
+        idempotency_key: Unique name of this notification, e.g. f"join:{channel_id}:{user_id}:admin"
+        buttons: Optional inline keyboard, rows of [text, callback_data]
+    """
+    session.execute(_notification_insert([(chat_id, text, idempotency_key, buttons)]))
+
+async def enqueue_notifications_async(session: AsyncSession, notifications: list):
+    """Enqueues (chat_id, text, idempotency_key, buttons) tuples with one multi-row INSERT, no commit."""
+    if notifications:
+        await session.execute(_notification_insert(notifications))
+
+def add_notifications(session: Session, notifications: list) -> bool:
+    """
+    Enqueues (chat_id, text, idempotency_key) tuples in one transaction of their own,
+    for producers that have no data change to attach them to.
+    """
+    try:
+        session.execute(_notification_insert([
+            (chat_id, text, idempotency_key, None) for chat_id, text, idempotency_key in notifications
+        ]))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error enqueueing {len(notifications)} notifications: {e}")
+        return False
+
+def claim_notifications(session: Session, limit: int = 50) -> list:
+    """
+    Leases the next `limit` due notifications to the caller (FOR UPDATE SKIP LOCKED, so concurrent
+    dispatchers never get the same row) and counts the delivery attempt.
+
+    Returns:
+        List[Dict]: id, chat_id, text, buttons and attempts of each claimed notification, oldest first
+    """
+    due = (
+        select(NotificationOutbox.id)
+        .where(
+            NotificationOutbox.sent_at.is_(None),
+            NotificationOutbox.attempts < OUTBOX_MAX_ATTEMPTS,
+            NotificationOutbox.next_attempt_at <= func.now()
+        )
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claimed = (
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(due))
+        .values(
+            attempts=NotificationOutbox.attempts + 1,
+            next_attempt_at=func.now() + OUTBOX_LEASE
+        )
+        .returning(
+            NotificationOutbox.id,
+            NotificationOutbox.chat_id,
+            NotificationOutbox.text,
+            NotificationOutbox.buttons,
+            NotificationOutbox.attempts
+        )
+    )
+    try:
+        rows = session.execute(claimed).all()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error claiming notifications: {e}")
+        raise
+    return sorted((row._asdict() for row in rows), key=lambda row: row['id'])
+
+def mark_notifications_sent(session: Session, notification_ids: list):
+    try:
+        session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(notification_ids))
+            .values(sent_at=func.now(), last_error=None)
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error marking {len(notification_ids)} notifications as sent: {e}")
+        raise
+
+def mark_notifications_failed(session: Session, failures: list):
+    """Schedules a retry with exponential backoff for each (id, attempts, error)."""
+    try:
+        for notification_id, attempts, error in failures:
+            delay = min(OUTBOX_RETRY_BASE * (2 ** (attempts - 1)), OUTBOX_RETRY_MAX)
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                LOGGER.error(f"Giving up on notification {notification_id} after {attempts} attempts: {error}")
+            session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == notification_id)
+                .values(next_attempt_at=func.now() + delay, last_error=error[:1000])
+            )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error recording {len(failures)} failed notifications: {e}")
+        raise
+
+def purge_sent_notifications(session: Session, older_than: timedelta = timedelta(days=7), chunk_size: int = 1000) -> int:
+    """
+    Deletes up to `chunk_size` notifications sent before `older_than` ago, in one short transaction.
+    Their idempotency keys are kept until then, so late duplicates are still ignored.
+
+    Returns:
+        int: Number of rows deleted, less than `chunk_size` once nothing is left
+    """
+    old_notifications = (
+        select(NotificationOutbox.id)
+        .where(NotificationOutbox.sent_at < datetime.now() - older_than)
+        .limit(chunk_size)
+        .scalar_subquery()
+    )
+    try:
+        deleted = session.execute(
+            delete(NotificationOutbox).where(NotificationOutbox.id.in_(old_notifications))
+        ).rowcount
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error purging sent notifications: {e}")
+        raise
+    return deleted
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, delete
-from db.models import PendingRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from db.models import PendingRequest, Subscription, AdminChannel, User, Channel
+from db.user_helpers import cache_user, _format_user_mention
+from db.channel_helpers import format_channel_mention
 from utils.logger import LOGGER
 
 def add_pending_request(session: Session, user_id: int, channel_id: int, admin_id: int) -> bool:
@@ -58,3 +62,94 @@ def check_pending_request(session: Session, user_id: int, channel_id: int) -> bo
     except Exception as e:
         print(f"Error checking pending request: {e}")
         return False, None
+
+
+# ---------- async helpers start
+
+async def load_join_context_async(session: AsyncSession, user_id: int, channel_id: int) -> dict | None:
+    """
+    Everything check_join_request needs, in one query: the channel, the user, the user's subscription
+    to the channel and their pending request, LEFT JOINed onto the channel row.
+
+    Returns:
+        Dict: channel_id, channel_mention, user_id, user_mention, expiry_date (None without a subscription)
+              and pending_admin_id (None without a pending request), None for an unknown channel
+    """
+    query = (
+        select(
+            Channel.channel_id,
+            Channel.channel_name,
+            User.fullname,
+            User.username,
+            Subscription.expiry_date,
+            PendingRequest.admin_id.label('pending_admin_id')
+        )
+        .select_from(Channel)
+        .outerjoin(User, User.user_id == user_id)
+        .outerjoin(Subscription, and_(Subscription.user_id == user_id, Subscription.channel_id == Channel.channel_id))
+        .outerjoin(PendingRequest, and_(PendingRequest.user_id == user_id, PendingRequest.channel_id == Channel.channel_id))
+        .where(Channel.channel_id == channel_id)
+    )
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+
+    if row.fullname is not None:
+        cache_user(user_id, row.fullname, row.username)
+    return {
+        'channel_id': row.channel_id,
+        'channel_mention': format_channel_mention(row.channel_id, row.channel_name),
+        'user_id': user_id,
+        'user_mention': _format_user_mention(user_id, row.fullname),
+        'expiry_date': row.expiry_date,
+        'pending_admin_id': row.pending_admin_id,
+    }
+
+async def promote_pending_request_async(session: AsyncSession, user_id: int, channel_id: int, days: int = 30) -> dict | None:
+    """
+    Turns a pending request into a subscription of `days` days in a single statement: the request is
+    deleted (only while its admin still owns the channel) and the subscription inserted from the deleted row.
+    An existing subscription keeps its expiry date.
+
+    Runs inside the caller's transaction without committing, so notifications about the new member can
+    be enqueued alongside (see db/outbox_helpers.py); the caller commits or rolls back.
+
+    Returns:
+        Dict: admin_id of the request and expiry_date of the subscription, None when there was nothing to promote
+    """
+    promoted = (
+        delete(PendingRequest)
+        .where(
+            PendingRequest.user_id == user_id,
+            PendingRequest.channel_id == channel_id,
+            select(AdminChannel.channel_id)
+            .where(AdminChannel.admin_id == PendingRequest.admin_id, AdminChannel.channel_id == channel_id)
+            .exists()
+        )
+        .returning(PendingRequest.user_id, PendingRequest.channel_id, PendingRequest.admin_id)
+        .cte("promoted")
+    )
+    subscribed = (
+        pg_insert(Subscription)
+        .from_select(
+            ['user_id', 'channel_id', 'expiry_date'],
+            select(promoted.c.user_id, promoted.c.channel_id, func.current_date() + days)
+        )
+        .on_conflict_do_update(
+            index_elements=['user_id', 'channel_id'],
+            set_={'expiry_date': Subscription.expiry_date}
+        )
+        .returning(Subscription.user_id, Subscription.channel_id, Subscription.expiry_date)
+        .cte("subscribed")
+    )
+    query = (
+        select(promoted.c.admin_id, subscribed.c.expiry_date)
+        .join(subscribed, and_(subscribed.c.user_id == promoted.c.user_id, subscribed.c.channel_id == promoted.c.channel_id))
+    )
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+    LOGGER.info(f"Promoted pending request of user {user_id} in channel {channel_id} (admin {row.admin_id}) to a subscription")
+    return row._asdict()
+
+# ---------- async helpers end
@@ -0,0 +1,125 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from utils.config import Config
+from utils.logger import LOGGER
+
+
+class PoolMetrics:
+    """
+    Counters for one connection pool.
+
+    - checkout latency: time spent in pool.connect(), including waiting for a free
+      connection, opening a new one and the pre-ping round trip
+    - connect time: TCP connect + SSL handshake + auth of each new DB connection
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_checkout_ms = 0.0
+        self.max_checkout_ms = 0.0
+        self.slow_checkouts = 0
+        self.connects = 0
+        self.total_connect_ms = 0.0
+        self.max_connect_ms = 0.0
+        self.peak_in_use = 0
+        self.peak_overflow = 0
+        self.pool = None
+
+    def record_checkout(self, elapsed_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_checkout_ms += elapsed_ms
+            self.max_checkout_ms = max(self.max_checkout_ms, elapsed_ms)
+            if self.pool is not None:
+                self.peak_in_use = max(self.peak_in_use, self.pool.checkedout())
+                self.peak_overflow = max(self.peak_overflow, self.pool.overflow())
+            if elapsed_ms > Config.DB_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+                LOGGER.warning(f"[{self.name}] slow connection checkout: {elapsed_ms:.0f} ms ({self.pool.status() if self.pool else ''})")
+
+    def record_connect(self, elapsed_ms: float):
+        with self._lock:
+            self.connects += 1
+            self.total_connect_ms += elapsed_ms
+            self.max_connect_ms = max(self.max_connect_ms, elapsed_ms)
+        LOGGER.info(f"[{self.name}] opened new DB connection in {elapsed_ms:.0f} ms")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool": self.name,
+                "in_use": self.pool.checkedout() if self.pool is not None else 0,
+                "overflow": self.pool.overflow() if self.pool is not None else 0,
+                "peak_in_use": self.peak_in_use,
+                "peak_overflow": self.peak_overflow,
+                "checkouts": self.checkouts,
+                "avg_checkout_ms": self.total_checkout_ms / self.checkouts if self.checkouts else 0.0,
+                "max_checkout_ms": self.max_checkout_ms,
+                "slow_checkouts": self.slow_checkouts,
+                "connects": self.connects,
+                "avg_connect_ms": self.total_connect_ms / self.connects if self.connects else 0.0,
+                "max_connect_ms": self.max_connect_ms,
+            }
+
+
+class _TimedCheckoutMixin:
+    """Times every checkout from the pool, pre-ping and new connections included."""
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        if self.metrics is not None:
+            self.metrics.record_checkout((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(poolclass) -> dict:
+    """create_engine keyword arguments for the pool, taken from Config."""
+    return {
+        "poolclass": poolclass,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_use_lifo": Config.DB_POOL_USE_LIFO,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+
+def instrument_engine(engine, metrics: PoolMetrics) -> PoolMetrics:
+    """Attach `metrics` to the engine's pool and time new connections."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    metrics.pool = sync_engine.pool
+    sync_engine.pool.metrics = metrics
+
+    @event.listens_for(sync_engine, "do_connect")
+    def _connect_started(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "connect")
+    def _connect_finished(dbapi_connection, conn_rec):
+        started = conn_rec.info.pop("connect_started", None)
+        if started is not None:
+            metrics.record_connect((time.perf_counter() - started) * 1000)
+
+    return metrics
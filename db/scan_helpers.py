@@ -0,0 +1,69 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta
+from db.models import ScanCheckpoint
+from db.subscription_helpers import insert_members_batch
+from utils.logger import LOGGER
+
+
+def get_scan_checkpoint(session: Session, channel_id: int) -> dict | None:
+    """Returns scanned, inserted, skipped and failed of the channel's unfinished /scan, None if there is none."""
+    row = session.execute(
+        select(ScanCheckpoint.scanned, ScanCheckpoint.inserted, ScanCheckpoint.skipped, ScanCheckpoint.failed, ScanCheckpoint.started_at)
+        .where(ScanCheckpoint.channel_id == channel_id)
+    ).first()
+    return row._asdict() if row else None
+
+def _save_checkpoint(session: Session, channel_id: int, progress: dict):
+    values = {key: progress[key] for key in ("scanned", "inserted", "skipped", "failed")}
+    session.execute(
+        pg_insert(ScanCheckpoint)
+        .values(channel_id=channel_id, **values)
+        .on_conflict_do_update(index_elements=['channel_id'], set_={**values, 'updated_at': func.now()})
+    )
+
+def import_scan_batch(session: Session, channel_id: int, members: list, days: int, progress: dict) -> dict:
+    """
+    Stores one batch of scanned members and moves the channel's checkpoint forward in the same
+    transaction, so a resumed scan never skips members that weren't written.
+    A batch that fails is counted as failed and the checkpoint still moves past it.
+
+    Args:
+        members (list): Dictionaries with user_id, username and fullname
+        progress (dict): scanned, inserted, skipped and failed so far, `scanned` already including this batch
+
+    Returns:
+        Dict: The updated progress
+    """
+    expiry_date = datetime.now().date() + timedelta(days=days)
+    progress = dict(progress)
+    try:
+        inserted = insert_members_batch(session, channel_id, members, expiry_date) if members else 0
+        progress["inserted"] += inserted
+        progress["skipped"] += len(members) - inserted
+        _save_checkpoint(session, channel_id, progress)
+        session.commit()
+        return progress
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error importing {len(members)} scanned members into channel {channel_id}: {e}")
+
+    progress["failed"] += len(members)
+    try:
+        _save_checkpoint(session, channel_id, progress)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error saving the scan checkpoint of channel {channel_id}: {e}")
+    return progress
+
+def clear_scan_checkpoint(session: Session, channel_id: int) -> bool:
+    try:
+        session.execute(delete(ScanCheckpoint).where(ScanCheckpoint.channel_id == channel_id))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error clearing the scan checkpoint of channel {channel_id}: {e}")
+        return False
@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy.exc import NoResultFound
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, update, delete, func, tuple_, literal, values, column, union_all, cast, BigInteger, Integer, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timedelta
 from db.models import User, AdminChannel, Subscription, Channel
-from db.user_helpers import delete_user_from_channel, get_user_mention
+from db.user_helpers import delete_user_from_channel, get_user_mention, USER_CACHE, _format_user_mention
 from db.admin_helpers import is_channel_admin
 from helpers.additional_bot_to_db_helper import kick_and_unban_user
 from pyrogram.errors import FloodWait, ChatAdminRequired, UserNotParticipant, PeerIdInvalid, UserBannedInChannel
-from db.channel_helpers import get_channel_mention
+from db.channel_helpers import get_channel_mention, format_channel_mention
+from db.executor import run_in_db_executor
+from helpers.text_helper import parse_duration
 from utils.logger import LOGGER
 
 
@@ -52,6 +54,7 @@ def add_subscription(session: Session, user_id: int, channel_id: int, admin_id:
 def get_subscriptions(session: Session, channel_id: int):
     """
     Fetches all users subscribed to a specific channel along with their subscription details.
+    For large channels prefer iter_subscriptions / get_subscriptions_page.
 
     Args:
         channel_id (int): The ID of the channel to fetch subscriptions for.
@@ -61,31 +64,50 @@ def get_subscriptions(session: Session, channel_id: int):
         list: A list of dictionaries containing user details and subscription info.
     """
     try:
-        # Query subscriptions for the given channel ID
-        subscriptions = (
-            session.query(Subscription)
-            .join(User, Subscription.user_id == User.user_id)
-            .filter(Subscription.channel_id == channel_id)
-            .all()
-        )
-
-        # Build the result list
-        subscription_list = [
-            {
-                "user_id": sub.user.user_id,
-                # "username": sub.user.username,
-                "fullname": sub.user.fullname,
-                "expiry_date": sub.expiry_date,
-            }
-            for sub in subscriptions
-        ]
-
-        return subscription_list
-
+        return [sub for page in iter_subscriptions(session, channel_id) for sub in page]
     except Exception as e:
         LOGGER.error(f"Error fetching subscriptions for channel {channel_id}: {e}")
         return []
 
+def get_subscriptions_page(session: Session, channel_id: int, after_user_id: int = None, limit: int = 500):
+    """
+    Fetches one page of a channel's subscribers ordered by user_id, starting after `after_user_id`.
+    Only plain columns are selected, no ORM objects are built.
+
+    Returns:
+        list: Dictionaries with user_id, fullname and expiry_date
+    """
+    query = (
+        select(Subscription.user_id, User.fullname, Subscription.expiry_date)
+        .join(User, Subscription.user_id == User.user_id)
+        .where(Subscription.channel_id == channel_id)
+        .order_by(Subscription.user_id)
+        .limit(limit)
+    )
+    if after_user_id is not None:
+        query = query.where(Subscription.user_id > after_user_id)
+
+    return [
+        {
+            "user_id": row.user_id,
+            "fullname": row.fullname,
+            "expiry_date": row.expiry_date,
+        }
+        for row in session.execute(query)
+    ]
+
+def iter_subscriptions(session: Session, channel_id: int, page_size: int = 500):
+    """Yields a channel's subscribers page by page (keyset on user_id) until all are read."""
+    after_user_id = None
+    while True:
+        page = get_subscriptions_page(session, channel_id, after_user_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_user_id = page[-1]["user_id"]
+
 # async def update_subscription(session: Session, user_id: int, channel_id: int, duration_text: str):
 #     """
 #     Update the subscription duration for a given user and channel.
@@ -203,58 +225,190 @@ async def update_subscription(session: Session, user_id: int, channel_id: int, a
     Returns:
         str: A message indicating the outcome of the update (e.g., updated expiry date or user removal).
     """
-    try:
-        LOGGER.info(f"update subscription for {user_id} - {channel_id} - {duration_text}")
-        # Verify admin has rights to this channel
-        if not is_channel_admin(session, admin_id, channel_id):
-            raise ValueError(f"Admin {admin_id} does not have rights to this channel {channel_id}")
+    LOGGER.info(f"update subscription for {user_id} - {channel_id} - {duration_text}")
+    action, value = parse_duration(duration_text)
 
-        # Fetch the subscription or create a new one if not found
-        subscription = (
-            session.query(Subscription)
-            .filter(
-                Subscription.user_id == user_id,
-                Subscription.channel_id == channel_id
-            )
-            .first()
-        )
-        
-        if not subscription:
-            # If subscription doesn't exist, create a new one
-            subscription = Subscription(user_id=user_id, channel_id=channel_id, expiry_date=datetime.now())
-            session.add(subscription)
-        
-    except NoResultFound:
-        raise NoResultFound("No subscription exists for the given user and channel.")
-    
     # Handle 'kick' action
-    action, value = parse_duration(duration_text)
     if action == "kick":
+        # Verify admin has rights to this channel
+        if not await run_in_db_executor(is_channel_admin, session, admin_id, channel_id):
+            raise ValueError(f"Admin {admin_id} does not have rights to this channel {channel_id}")
         return await handle_kick_action(session, user_id, channel_id)
 
-    # Handle valid date string (DD-MM-YYYY format)
+    # Admin check, extend/set and the names for the message all happen in one statement
+    subscription = await run_in_db_executor(upsert_subscription_expiry, session, user_id, channel_id, admin_id, action, value)
+    if subscription is None:
+        raise ValueError(f"Admin {admin_id} does not have rights to this channel {channel_id}")
+
+    user_mention = _format_user_mention(subscription['user_id'], subscription['fullname'])
+    channel_mention = format_channel_mention(subscription['channel_id'], subscription['channel_name'])
+    return f"Subscription for user {user_mention} in channel {channel_mention} updated to expire on `{subscription['expiry_date']}`."
+
+
+
+# ---------- supporting helper functions start
+
+# Days added per duration unit (months and years are approximate)
+UNIT_TO_DAYS = {
+    'd': 1,          # days
+    'w': 7,          # weeks
+    'm': 30,         # months (approx)
+    'y': 365         # years (approx)
+}
+
+def upsert_subscription_expiry(session: Session, user_id: int, channel_id: int, admin_id: int, action: str, value) -> dict | None:
+    """
+    Sets or extends a subscription atomically, in a single round trip.
+
+    INSERT ... SELECT ... WHERE <admin owns channel> ON CONFLICT (user_id, channel_id) DO UPDATE,
+    the new expiry is computed by Postgres from the stored row, so concurrent updates and the
+    expiry job can't overwrite each other with stale dates. A new subscription starts from today.
+
+    Args:
+        action: A duration unit from parse_duration ('d', 'w', 'm', 'y') or 'date'
+        value: Number of units, or the datetime to set for 'date'
+
+    Returns:
+        Dict: subscription_id, user_id, channel_id, expiry_date, fullname and channel_name of the stored row,
+              None when the admin has no rights to the channel
+    """
     if action == "date":
-        expiry_date = value  # Already a datetime object
-        subscription.expiry_date = expiry_date
+        inserted_expiry = updated_expiry = literal(value.date(), Date)
+    else:
+        days = value * UNIT_TO_DAYS[action]
+        inserted_expiry = func.current_date() + days
+        updated_expiry = Subscription.expiry_date + days
+
+    admin_owns_channel = (
+        select(AdminChannel.channel_id)
+        .where(AdminChannel.admin_id == admin_id, AdminChannel.channel_id == channel_id)
+        .exists()
+    )
+    upserted = (
+        pg_insert(Subscription)
+        .from_select(
+            ['user_id', 'channel_id', 'expiry_date'],
+            select(literal(user_id, BigInteger), literal(channel_id, BigInteger), inserted_expiry).where(admin_owns_channel)
+        )
+        .on_conflict_do_update(
+            index_elements=['user_id', 'channel_id'],
+            set_={'expiry_date': updated_expiry}
+        )
+        .returning(
+            Subscription.subscription_id,
+            Subscription.user_id,
+            Subscription.channel_id,
+            Subscription.expiry_date
+        )
+        .cte("upserted")
+    )
+    query = (
+        select(
+            upserted.c.subscription_id,
+            upserted.c.user_id,
+            upserted.c.channel_id,
+            upserted.c.expiry_date,
+            User.fullname,
+            Channel.channel_name
+        )
+        .join(User, User.user_id == upserted.c.user_id)
+        .join(Channel, Channel.channel_id == upserted.c.channel_id)
+    )
+
+    try:
+        row = session.execute(query).first()
         session.commit()
-        return f"Subscription for user {get_user_mention(session, user_id)} in channel {get_channel_mention(session, channel_id)} updated to expire on `{subscription.expiry_date}`."
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error updating subscription of user {user_id} in channel {channel_id}: {e}")
+        raise
+    return row._asdict() if row else None
 
-    # Compute the new expiry date based on the parsed duration
-    new_expiry = calculate_new_expiry(subscription.expiry_date, action, value)
-    subscription.expiry_date = new_expiry
-    session.commit()
-    return f"Subscription for user {get_user_mention(session, user_id)} in channel {get_channel_mention(session, channel_id)} updated to expire on `{subscription.expiry_date}`."
+def bulk_update_subscriptions(session: Session, channel_id: int, admin_id: int, changes: list) -> list:
+    """
+    Applies many subscription changes of one channel in a single transaction and a single statement.
 
+    The changes are sent as one VALUES list. A data-modifying CTE updates the existing rows, computing
+    the new expiry from the stored one, and a second one inserts the users that had no subscription yet.
+    Either every change is applied or, on error, none.
 
+    Args:
+        changes: (user_id, action, value) tuples as returned by parse_duration, 'kick' excluded.
+                 A user listed twice keeps the last change.
 
-# ---------- supporting helper functions start
+    Raises:
+        ValueError: The admin has no rights to the channel
+
+    Returns:
+        List[Dict]: subscription_id, user_id, fullname and new expiry_date of every stored row
+    """
+    latest = {}
+    for user_id, action, value in changes:
+        if action == "date":
+            latest[user_id] = (user_id, None, value.date())
+        else:
+            latest[user_id] = (user_id, value * UNIT_TO_DAYS[action], None)
+    if not latest:
+        return []
+
+    changes_values = values(
+        column('user_id', BigInteger),
+        column('days', Integer),
+        column('set_date', Date),
+        name='changes'
+    ).data(list(latest.values()))
+    # VALUES columns reach Postgres untyped, and a column that is NULL in every row resolves to text
+    days = cast(changes_values.c.days, Integer)
+    set_date = cast(changes_values.c.set_date, Date)
+
+    updated = (
+        update(Subscription)
+        .where(Subscription.channel_id == channel_id, Subscription.user_id == changes_values.c.user_id)
+        .values(expiry_date=func.coalesce(set_date, Subscription.expiry_date + days))
+        .returning(Subscription.subscription_id, Subscription.user_id, Subscription.expiry_date)
+        .cte("updated")
+    )
+    inserted = (
+        pg_insert(Subscription)
+        .from_select(
+            ['user_id', 'channel_id', 'expiry_date'],
+            select(
+                changes_values.c.user_id,
+                literal(channel_id, BigInteger),
+                func.coalesce(set_date, func.current_date() + days)
+            ).where(changes_values.c.user_id.not_in(select(updated.c.user_id)))
+        )
+        .on_conflict_do_nothing(index_elements=['user_id', 'channel_id'])
+        .returning(Subscription.subscription_id, Subscription.user_id, Subscription.expiry_date)
+        .cte("inserted")
+    )
+    stored = union_all(
+        select(updated.c.subscription_id, updated.c.user_id, updated.c.expiry_date),
+        select(inserted.c.subscription_id, inserted.c.user_id, inserted.c.expiry_date)
+    ).subquery("stored")
+    query = (
+        select(stored.c.subscription_id, stored.c.user_id, User.fullname, stored.c.expiry_date)
+        .join(User, User.user_id == stored.c.user_id)
+        .order_by(stored.c.user_id)
+    )
+
+    try:
+        if not is_channel_admin(session, admin_id, channel_id):
+            raise ValueError(f"Admin {admin_id} does not have rights to this channel {channel_id}")
+        rows = session.execute(query).all()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error applying {len(latest)} subscription updates in channel {channel_id}: {e}")
+        raise
+    return [row._asdict() for row in rows]
 
 async def handle_kick_action(session, user_id: int, channel_id: int) -> str:
     """Handle the 'kick' action."""
     LOGGER.info(f"Entering handle_kick_action with user_id={user_id}, channel_id={channel_id}")
     try:
-        user_mention = get_user_mention(session, user_id)
-        channel_mention = get_channel_mention(session, channel_id)
+        user_mention = await run_in_db_executor(get_user_mention, session, user_id)
+        channel_mention = await run_in_db_executor(get_channel_mention, session, channel_id)
         await kick_and_unban_user(user_id, channel_id)
     except ChatAdminRequired as e:
         LOGGER.warning(f"Caught ChatAdminRequired exception: {e}")
@@ -275,7 +429,7 @@ async def handle_kick_action(session, user_id: int, channel_id: int) -> str:
         return str(e)
     
     # Log whether the user was successfully removed or not
-    if delete_user_from_channel(session, user_id, channel_id):
+    if await run_in_db_executor(delete_user_from_channel, session, user_id, channel_id):
         result = f"User {user_mention}(`{user_id}`) has been removed from channel {channel_mention}."
     else:
         result = "Error removing user from channel."
@@ -298,18 +452,10 @@ def calculate_new_expiry(current_expiry: datetime, unit: str, value: int) -> dat
     """Calculate the new expiry date based on unit and value."""
     LOGGER.info(f"Entering calculate_new_expiry with current_expiry={current_expiry}, unit={unit}, value={value}")
 
-    # Map units to their respective multipliers in days
-    unit_to_days = {
-        'd': 1,          # days
-        'w': 7,          # weeks
-        'm': 30,         # months (approx)
-        'y': 365         # years (approx)
-    }
-
     # Check if the unit is valid and calculate the new expiry
-    if unit in unit_to_days:
+    if unit in UNIT_TO_DAYS:
         try:
-            new_expiry = current_expiry + timedelta(days=value * unit_to_days[unit])
+            new_expiry = current_expiry + timedelta(days=value * UNIT_TO_DAYS[unit])
             LOGGER.info(f"Exiting calculate_new_expiry with new_expiry={new_expiry}")
             return new_expiry
         except Exception as e:
@@ -318,47 +464,6 @@ def calculate_new_expiry(current_expiry: datetime, unit: str, value: int) -> dat
     LOGGER.warning(f"Exiting calculate_new_expiry with no changes to expiry (invalid unit)")
     return current_expiry
 
-def parse_duration(duration_text: str) -> tuple:
-    """Parse the duration_text and return value and unit or a date."""
-    LOGGER.info(f"Entering parse_duration with duration_text={duration_text}")
-    
-    # Check for 'kick' command
-    if duration_text.strip().lower() == "kick":
-        LOGGER.info("Exiting parse_duration: 'kick' action detected.")
-        return "kick", None
-
-    # Check for valid date format (DD-MM-YYYY or YYYY-MM-DD)
-    for date_format in ["%d-%m-%Y", "%Y-%m-%d"]:
-        try:
-            expiry_date = datetime.strptime(duration_text, date_format)
-            LOGGER.info(f"Exiting parse_duration: Valid date format detected: {duration_text}")
-            return "date", expiry_date
-        except ValueError:
-            continue  # Try the next format
-
-    # Handle duration formats like 20d, 3w, etc.
-    duration_map = {
-        'd': 'days',
-        'w': 'weeks',
-        'm': 'months',
-        'y': 'years'
-    }
-
-    try:
-        value = int(duration_text[:-1])  # Get the numeric part
-        unit = duration_text[-1].lower()  # Get the unit part (d, w, m, y)
-
-        if unit not in duration_map:
-            raise ValueError("Invalid duration unit. Use 'd', 'w', 'm', or 'y'.")
-        
-        LOGGER.info(f"Exiting parse_duration with parsed values: unit={unit}, value={value}")
-        return unit, value
-    except (ValueError, IndexError):
-        LOGGER.warning("Exiting parse_duration: Invalid duration format.")
-        raise ValueError("Invalid duration format. Use formats like '20d', '2w', '3m', '1y', 'DD-MM-YYYY' or 'YYYY-MM-DD'.")
-
-
-
 # ---------- supporting helper functions end
 
 
@@ -490,9 +595,149 @@ def remove_expired_subscriptions(session: Session, admin_id: int = None):
 
     # Clean up users with no active subscriptions (only if no admin_id is provided)
     if not admin_id:
-        session.execute(
-            delete(User).where(~User.subscriptions.any())
-        )
+        deleted_ids = session.execute(
+            delete(User).where(~User.subscriptions.any()).returning(User.user_id)
+        ).scalars().all()
+        USER_CACHE.invalidate_many(deleted_ids)
 
     session.commit()
     return expired_users
+
+
+
+# ---------- bulk expiry helpers start
+
+def claim_expired_subscriptions(session: Session, after: tuple = None, admin_id: int = None, limit: int = 500):
+    """
+    Deletes the next `limit` expired subscriptions in (expiry_date, subscription_id) order
+    and returns them, so callers own the removal of those members.
+
+    Args:
+        after (tuple, optional): (expiry_date, subscription_id) of the last claimed row, only rows after it are claimed
+        admin_id (int, optional): Only claim subscriptions of this admin's channels
+        limit (int): Batch size
+
+    Returns:
+        List[Dict]: subscription_id, user_id, user_fullname, channel_id, channel_name and expiry_date of each claimed row
+    """
+    today = datetime.now().date()
+    next_batch = (
+        select(Subscription.subscription_id)
+        .where(Subscription.expiry_date <= today)
+        .order_by(Subscription.expiry_date, Subscription.subscription_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if after is not None:
+        next_batch = next_batch.where(
+            tuple_(Subscription.expiry_date, Subscription.subscription_id) > tuple_(*after)
+        )
+    if admin_id:
+        admin_channels_subquery = select(AdminChannel.channel_id).where(AdminChannel.admin_id == admin_id)
+        next_batch = next_batch.where(Subscription.channel_id.in_(admin_channels_subquery))
+
+    claimed = (
+        delete(Subscription)
+        .where(Subscription.subscription_id.in_(next_batch.scalar_subquery()))
+        .returning(
+            Subscription.subscription_id,
+            Subscription.user_id,
+            Subscription.channel_id,
+            Subscription.expiry_date
+        )
+        .cte("claimed")
+    )
+    query = (
+        select(
+            claimed.c.subscription_id,
+            claimed.c.user_id,
+            User.fullname,
+            claimed.c.channel_id,
+            Channel.channel_name,
+            claimed.c.expiry_date
+        )
+        .join(User, User.user_id == claimed.c.user_id)
+        .join(Channel, Channel.channel_id == claimed.c.channel_id)
+        .order_by(claimed.c.expiry_date, claimed.c.subscription_id)
+    )
+
+    try:
+        results = session.execute(query).all()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error claiming expired subscriptions: {e}")
+        raise
+
+    return [
+        {
+            'subscription_id': row.subscription_id,
+            'user_id': row.user_id,
+            'user_fullname': row.fullname,
+            'channel_id': row.channel_id,
+            'channel_name': row.channel_name,
+            'expiry_date': row.expiry_date
+        }
+        for row in results
+    ]
+
+def restore_subscriptions(session: Session, subscriptions: list):
+    """
+    Puts claimed subscriptions back, e.g. when the member could not be removed from the chat.
+    Rows re-added in the meantime (same user and channel) are left untouched.
+    """
+    if not subscriptions:
+        return 0
+    try:
+        result = session.execute(
+            pg_insert(Subscription)
+            .values([
+                {
+                    'subscription_id': sub['subscription_id'],
+                    'user_id': sub['user_id'],
+                    'channel_id': sub['channel_id'],
+                    'expiry_date': sub['expiry_date'],
+                }
+                for sub in subscriptions
+            ])
+            .on_conflict_do_nothing()
+        )
+        session.commit()
+        return result.rowcount
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error restoring subscriptions: {e}")
+        return 0
+
+# ---------- bulk expiry helpers end
+
+
+# ---------- bulk import helpers start
+
+def insert_members_batch(session: Session, channel_id: int, members: list, expiry_date) -> int:
+    """
+    Inserts one batch of members (users and subscriptions, ON CONFLICT DO NOTHING) without committing.
+
+    Returns:
+        int: Number of subscriptions created, the rest of the batch was already subscribed
+    """
+    session.execute(
+        pg_insert(User)
+        .values([
+            {"user_id": member["user_id"], "username": member["username"], "fullname": member["fullname"]}
+            for member in members
+        ])
+        .on_conflict_do_nothing(index_elements=[User.user_id])
+    )
+    inserted = session.execute(
+        pg_insert(Subscription)
+        .values([
+            {"user_id": member["user_id"], "channel_id": channel_id, "expiry_date": expiry_date}
+            for member in members
+        ])
+        .on_conflict_do_nothing(index_elements=[Subscription.user_id, Subscription.channel_id])
+        .returning(Subscription.user_id)
+    ).scalars().all()
+    return len(inserted)
+
+# ---------- bulk import helpers end
@@ -1,9 +1,23 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, exists
 from db.models import User, Subscription, Channel, PendingRequest
 from sqlalchemy import and_
+from db.cache import TTLCache
+from utils.config import Config
 from utils.logger import LOGGER
 
+# LRU+TTL cache of user_id -> (fullname, username), filled on add and invalidated when users are deleted
+USER_CACHE = TTLCache("users", maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+def cache_user(user_id: int, fullname: str, username: str = None):
+    USER_CACHE.set(user_id, (fullname, username))
+
+def user_cache_stats() -> dict:
+    return USER_CACHE.stats()
+
+def _format_user_mention(user_id: int, fullname: str) -> str:
+    return f"[{fullname}](tg://user?id={user_id})"
+
 # Helper function to add a new user
 def add_user(session: Session, user_id: int, username: str = None, fullname: str = None):
     try:
@@ -15,6 +29,7 @@ def add_user(session: Session, user_id: int, username: str = None, fullname: str
             session.add(user)
             session.commit()
             LOGGER.info(f"successfully added new user : {user_id}")
+        cache_user(user.user_id, user.fullname, user.username)
         return user
     except Exception as e:
         LOGGER.error(f"Error adding user {user_id} : {e}")
@@ -32,10 +47,15 @@ def get_userfull(session: Session, user_id: int):
 
 def get_user_mention(session: Session, user_id: int) -> str:
     try:
+        cached = USER_CACHE.get(user_id)
+        if cached is not None:
+            return _format_user_mention(user_id, cached[0])
+
         user = session.query(User).filter(User.user_id == user_id).one_or_none()
 
         if user:
-            formatted_string = f"[{user.fullname}](tg://user?id={user.user_id})"
+            cache_user(user.user_id, user.fullname, user.username)
+            formatted_string = _format_user_mention(user.user_id, user.fullname)
             return formatted_string
         else:
             return None  # Or raise an exception if appropriate
@@ -44,6 +64,33 @@ def get_user_mention(session: Session, user_id: int) -> str:
         LOGGER.error(f"Error retrieving user: {e}")
         return None
 
+def get_user_mentions(session: Session, user_ids) -> dict:
+    """
+    Resolves mentions for many users at once, cache misses are fetched with a single IN query.
+
+    Returns:
+        dict: user_id -> mention, unknown users are left out
+    """
+    mentions, missing = {}, []
+    for user_id in set(user_ids):
+        cached = USER_CACHE.get(user_id)
+        if cached is not None:
+            mentions[user_id] = _format_user_mention(user_id, cached[0])
+        else:
+            missing.append(user_id)
+
+    if missing:
+        try:
+            rows = session.execute(
+                select(User.user_id, User.fullname, User.username).where(User.user_id.in_(missing))
+            )
+            for row in rows:
+                cache_user(row.user_id, row.fullname, row.username)
+                mentions[row.user_id] = _format_user_mention(row.user_id, row.fullname)
+        except Exception as e:
+            LOGGER.error(f"Error retrieving users: {e}")
+    return mentions
+
 def get_user_subscription(session: Session, user_id: int, channel_id: int):
     try:
         # Query the Subscription, User, and Channel tables in one go
@@ -90,24 +137,82 @@ def get_user_channels(session: Session, user_id: int):
         LOGGER.error(f"Error fetching Channels: {e}")
         return None
 
-def remove_extra_users(session: Session):
+def remove_extra_users_chunk(session: Session, after: int = None, chunk_size: int = 1000):
+    """
+    Removes the next `chunk_size` users (by user_id, after `after`) who have no subscriptions
+    or pending requests, in one short transaction.
+
+    Returns:
+        Tuple[int, int]: last user_id looked at (None when the sweep is done) and number of users removed
+    """
+    query = (
+        select(User.user_id)
+        .where(
+            ~exists().where(Subscription.user_id == User.user_id),
+            ~exists().where(PendingRequest.user_id == User.user_id)
+        )
+        .order_by(User.user_id)
+        .limit(chunk_size)
+    )
+    if after is not None:
+        query = query.where(User.user_id > after)
+
+    orphan_ids = session.execute(query).scalars().all()
+    if not orphan_ids:
+        return None, 0
+    removed = remove_orphaned_users(session, orphan_ids)
+    return (orphan_ids[-1] if len(orphan_ids) == chunk_size else None), removed
+
+def remove_extra_users(session: Session, chunk_size: int = 1000):
     """
     Removes users from the `users` table who have no subscriptions left.
+    Full-table sweep, deleting in chunks so it never holds long locks on `users`.
+    After touching a known set of users use remove_orphaned_users instead.
     """
     try:
-        # Delete users who do not have any related subscriptions or pending requests
-        session.query(User).filter(
-            ~session.query(Subscription.user_id).filter(Subscription.user_id == User.user_id).exists(),
-            ~session.query(PendingRequest.user_id).filter(PendingRequest.user_id == User.user_id).exists()
-        ).delete(synchronize_session=False)
-        
-        session.commit()
-        LOGGER.info("Removed Extra user.")
+        after, total_removed = None, 0
+        while True:
+            after, removed = remove_extra_users_chunk(session, after, chunk_size)
+            total_removed += removed
+            if after is None:
+                break
+        LOGGER.info(f"Removed {total_removed} Extra users.")
         return True
     except Exception as e:
+        session.rollback()
         LOGGER.error(f"Error Removing Extra Users: {e}")
         return None
 
+def remove_orphaned_users(session: Session, user_ids, chunk_size: int = 1000):
+    """
+    Removes only the given users from the `users` table if they have no subscriptions
+    or pending requests left. Use instead of remove_extra_users after touching a known set of users.
+
+    Returns:
+        int: Number of users removed
+    """
+    user_ids = list(user_ids)
+    removed = 0
+    try:
+        for start in range(0, len(user_ids), chunk_size):
+            deleted_ids = session.execute(
+                delete(User).where(
+                    User.user_id.in_(user_ids[start:start + chunk_size]),
+                    ~exists().where(Subscription.user_id == User.user_id),
+                    ~exists().where(PendingRequest.user_id == User.user_id)
+                ).returning(User.user_id)
+            ).scalars().all()
+            USER_CACHE.invalidate_many(deleted_ids)
+            removed += len(deleted_ids)
+        session.commit()
+        if removed:
+            LOGGER.info(f"Removed {removed} orphaned users.")
+        return removed
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error Removing orphaned users: {e}")
+        return 0
+
 def delete_user_from_channel(session: Session, user_id: int, channel_id: int):
     """
     Deletes the relationship between a user and a channel from the subscriptions table.
@@ -119,10 +224,10 @@ def delete_user_from_channel(session: Session, user_id: int, channel_id: int):
             session.delete(subscription)
             session.commit()
 
-            # Check if the user has any remaining subscriptions and remove if none exist
-            remove_extra_users(session)
+            # Remove the user if this was their last subscription
+            remove_orphaned_users(session, [user_id])
             LOGGER.info(f"User {user_id} subscription from channel - {channel_id} has been successfully deleted")
         return True
     except Exception as e:
         LOGGER.error(f"Error Deleting User from channel: {e}")
-        return False
\ No newline at end of file
+        return False
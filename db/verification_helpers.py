@@ -1,25 +1,97 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import select, delete, func
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from db.models import User, Subscription, VerificationCode
 from db.pendingrequest_helpers import add_pending_request
+from db.user_helpers import cache_user
 from utils.logger import LOGGER
-import hashlib
+import secrets
+import threading
+
+VERIFICATION_CODE_TTL = timedelta(minutes=10)
+CODE_GENERATION_ATTEMPTS = 5
+
+
+class LiveCodeIndex:
+    """
+    In-memory set of the codes that are currently valid, with their expiry.
+
+    Lets /code reject unknown or expired codes without a query. The database stays the
+    source of truth: known codes are still checked there. The index is filled from
+    `verification_codes` on first use, so codes issued before a restart keep working.
+    (Assumes a single bot process issues the codes.)
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def ensure_loaded(self, session: Session):
+        if self._loaded:
+            return
+        rows = session.execute(
+            select(VerificationCode.code, VerificationCode.expires_at)
+            .where(VerificationCode.expires_at > datetime.now())
+        ).all()
+        with self._lock:
+            for code, expires_at in rows:
+                self._codes.setdefault(code, expires_at)
+            self._loaded = True
+        LOGGER.info(f"Loaded {len(rows)} live verification codes")
+
+    def add(self, code: str, expires_at: datetime):
+        with self._lock:
+            self._codes[code] = expires_at
+
+    def discard(self, code: str):
+        with self._lock:
+            self._codes.pop(code, None)
+
+    def is_live(self, code: str) -> bool:
+        with self._lock:
+            expires_at = self._codes.get(code)
+            return expires_at is not None and expires_at > datetime.now()
+
+    def prune(self) -> int:
+        now = datetime.now()
+        with self._lock:
+            expired = [code for code, expires_at in self._codes.items() if expires_at <= now]
+            for code in expired:
+                del self._codes[code]
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._codes)
+
+
+LIVE_CODES = LiveCodeIndex()
 
 
 # Helper function to generate a verification code
 def generate_verification_code(session: Session, admin_id: int, channel_id: int):
-    # Create a unique code based on user ID, channel ID, and the current timestamp
-    timestamp = int(datetime.now().timestamp() * 1000)  # Get the current timestamp in milliseconds
-    code = hashlib.sha256(f"{channel_id}{timestamp}".encode()).hexdigest()[:8]
-    
-    expires_at = datetime.now() + timedelta(minutes=10)
-    verification_code = VerificationCode(
-        code=code, admin_id=admin_id, channel_id=channel_id, expires_at=expires_at
-    )
-    session.add(verification_code)
-    session.commit()
-    return verification_code
+    """
+    Issues a random 8 character code valid for VERIFICATION_CODE_TTL.
+    Codes come from `secrets`, a clash with a stored code (primary key) is retried with a new one.
+    """
+    expires_at = datetime.now() + VERIFICATION_CODE_TTL
+    for _ in range(CODE_GENERATION_ATTEMPTS):
+        code = secrets.token_hex(4)
+        verification_code = VerificationCode(
+            code=code, admin_id=admin_id, channel_id=channel_id, expires_at=expires_at
+        )
+        session.add(verification_code)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            LOGGER.warning(f"Verification code '{code}' already exists, generating another one.")
+            continue
+        LIVE_CODES.add(code, expires_at)
+        return verification_code
+    raise RuntimeError("Could not generate a unique verification code")
 
 
 def validate_and_add_user(session: Session, user_id: int, code: str, username: str, fullname: str):
@@ -35,8 +107,14 @@ def validate_and_add_user(session: Session, user_id: int, code: str, username: s
         admin_id (int): The admin's ID who created the verification code
     """
     try:
-        # Step 1: Validate the verification code
+        # Step 1: Validate the verification code, unknown/expired codes are rejected from memory
         LOGGER.info(f"Validating verification code '{code}' for user '{username}' (ID: {user_id}).")
+        code = code.strip().lower()
+        LIVE_CODES.ensure_loaded(session)
+        if not LIVE_CODES.is_live(code):
+            LOGGER.warning(f"Verification code '{code}' for user '{username}' (ID: {user_id}) is invalid or expired.")
+            return False, None, False, None  # Validation failed
+
         verified_code = (
             session.query(VerificationCode)
             .filter(VerificationCode.code == code, VerificationCode.expires_at > datetime.now())
@@ -45,9 +123,8 @@ def validate_and_add_user(session: Session, user_id: int, code: str, username: s
 
         if not verified_code:
             LOGGER.warning(f"Verification code '{code}' for user '{username}' (ID: {user_id}) is invalid or expired.")
-            # Code invalid; delete the expired codes (if any exist)
-            cleanup_expired_verification_codes(session)
-            return False, None, False  # Validation failed
+            LIVE_CODES.discard(code)
+            return False, None, False, None  # Validation failed
 
         # Step 2: Add the user to the Users table (if not already present)
         user = session.query(User).filter(User.user_id == user_id).first()
@@ -82,6 +159,8 @@ def validate_and_add_user(session: Session, user_id: int, code: str, username: s
 
         # Commit the changes to the database
         session.commit()
+        LIVE_CODES.discard(code)
+        cache_user(user.user_id, user.fullname, user.username)
         LOGGER.info(f"User '{username}' (ID: {user_id}) successfully within channel ID '{channel_id}'.")
         return True, channel_id, is_new_to_channel, admin_id  # Validation succeeded
 
@@ -89,12 +168,30 @@ def validate_and_add_user(session: Session, user_id: int, code: str, username: s
         # Log the exception and rollback the transaction
         LOGGER.error(f"An error occurred while validating and adding user '{username}' (ID: {user_id}): {e}")
         session.rollback()  # Rollback the transaction to avoid partial commits
-        return False, None, False
+        return False, None, False, None
 
-def cleanup_expired_verification_codes(session: Session):
+def purge_expired_verification_codes_chunk(session: Session, chunk_size: int = 1000) -> int:
     """
-    Removes expired verification codes from the `VerificationCodes` table.
-    """
-    session.query(VerificationCode).filter(VerificationCode.expires_at <= datetime.now()).delete()
-    session.commit()
+    Deletes up to `chunk_size` expired verification codes in one short transaction.
+    Run by the scheduler (see helpers/scheduler.py), not on the /code path.
 
+    Returns:
+        int: Number of codes deleted, less than `chunk_size` once nothing is left
+    """
+    expired_codes = (
+        select(VerificationCode.code)
+        .where(VerificationCode.expires_at <= datetime.now())
+        .limit(chunk_size)
+        .scalar_subquery()
+    )
+    try:
+        deleted = session.execute(
+            delete(VerificationCode).where(VerificationCode.code.in_(expired_codes))
+        ).rowcount
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        LOGGER.error(f"Error purging expired verification codes: {e}")
+        raise
+    LIVE_CODES.prune()
+    return deleted
@@ -4,8 +4,10 @@ from pyrogram.errors import FloodWait, ChatAdminRequired, UserNotParticipant, Pe
 from db.channel_helpers import get_all_channels
 from db.subscription_helpers import update_subscription
 from db.connection import get_db
+from db.executor import run_db
 from db.admin_helpers import list_admins
 from helpers.text_helper import create_channel_mention
+from helpers.bot_privileges import BOT_PRIVILEGES
 from typing import Dict, List, Tuple
 from utils.logger import LOGGER
 import asyncio
@@ -74,7 +76,10 @@ async def update_single_user_subscription(session, user_id, channel_id, admin_id
                         all_channels_operational = False
 
                     except FloodWait as e:
-                        await asyncio.sleep(e.value)
+                        # Still rate limited after the API governor's retries
+                        status_report += f"⏳ {create_channel_mention(channel_name, channel_id)}: Rate limited, retry in {e.value}s\n"
+                        channels_operational = False
+                        all_channels_operational = False
                     except Exception as e:
                         LOGGER.error(f"Unexpected error checking channel {channel_name}: {type(e)} {str(e)}")
                         status_report += f"❌ {create_channel_mention(channel_name, channel_id)}: Error checking status: {e}\n"
@@ -91,12 +96,78 @@ async def update_single_user_subscription(session, user_id, channel_id, admin_id
         LOGGER.error(f"Error in check_status: {e}")
         return f"❌ Error checking status: {str(e)}"
 
+# Max channels probed at once, the API governor still paces the calls themselves
+STATUS_CHECK_CONCURRENCY = 10
+
+async def probe_channel(channel_id: int) -> Tuple[str, str]:
+    """
+    Checks the bot's access to one channel/group with get_chat, privileges come from BOT_PRIVILEGES.
+
+    Returns:
+        Tuple[str, str]: status ('ok', 'admin_required', 'needs_interaction', 'rate_limited' or 'error')
+                         and a detail for the report ('' when there is none)
+    """
+    bot_instance = await get_bot_instance()
+    try:
+        await bot_instance.get_chat(channel_id)
+        member = await BOT_PRIVILEGES.get(channel_id)
+        return ("ok", "") if member.privileges else ("admin_required", "")
+    except ChatAdminRequired:
+        BOT_PRIVILEGES.invalidate(channel_id)
+        return "admin_required", ""
+    except (PeerIdInvalid, ValueError):
+        return "needs_interaction", ""
+    except FloodWait as e:
+        # Still rate limited after the API governor's retries
+        return "rate_limited", f"{e.value}"
+    except Exception as e:
+        LOGGER.error(f"Unexpected error checking channel {channel_id}: {type(e)} {str(e)}")
+        return "error", str(e)
+
+async def probe_channels(channel_ids) -> Dict[int, Tuple[str, str]]:
+    """Probes every channel once, STATUS_CHECK_CONCURRENCY at a time. Returns {channel_id: (status, detail)}."""
+    channel_ids = list(dict.fromkeys(channel_ids))  # unique, in order
+    semaphore = asyncio.Semaphore(STATUS_CHECK_CONCURRENCY)
+
+    async def probe(channel_id):
+        async with semaphore:
+            return await probe_channel(channel_id)
+
+    results = await asyncio.gather(*(probe(channel_id) for channel_id in channel_ids))
+    return dict(zip(channel_ids, results))
+
+def build_status_report(admin_channels: List[Dict], channel_statuses: Dict[int, Tuple[str, str]], header: str = "") -> Tuple[str, bool]:
+    """Formats one admin's report from the probed statuses, returns (report, all channels operational)."""
+    status_report = header
+    channels_operational = True
+
+    for channel in admin_channels:
+        channel_mention = create_channel_mention(channel['name'], channel['id'])
+        status, detail = channel_statuses[channel['id']]
+        if status == "ok":
+            status_report += f"✅ {channel_mention}: Working Properly\n"
+            continue
+
+        channels_operational = False
+        if status == "admin_required":
+            status_report += f"⚠️ {channel_mention}: Admin Rights Needed\n"
+        elif status == "needs_interaction":
+            status_report += f"🗣 {channel_mention}: Needs Interaction\n"
+        elif status == "rate_limited":
+            status_report += f"⏳ {channel_mention}: Rate limited, retry in {detail}s\n"
+        else:
+            status_report += f"❌ {channel_mention}: Error checking status: {detail}\n"
+
+    if not channels_operational:  # Append instructions if any channel has issues
+        status_report += get_instruction_message()  # See below
+
+    return status_report, channels_operational
+
 async def check_admin_status(admin_id: int, admin_channels: List[Dict]) -> Tuple[str, bool]:
     """
     Checks the bot's access status for channels/groups associated with a specific admin.
     
     Args:
-        bot_instance (TelegramClient): The Telegram bot instance.
         admin_id (int): The ID of the admin to check.
         admin_channels (List[Dict]): List of channels associated with the admin.
     
@@ -104,48 +175,14 @@ async def check_admin_status(admin_id: int, admin_channels: List[Dict]) -> Tuple
         Tuple[str, bool]: A tuple containing the status report (str) and a boolean
                           indicating if all channels are operational.
     """
-    bot_instance = await get_bot_instance()
-    status_report = "All Channels Status Report 📝\n"
-    channels_operational = True
-
-    for channel in admin_channels:
-        channel_id = channel['id']
-        channel_name = channel['name']
-        try:
-            chat = await bot_instance.get_chat(channel_id)
-            member = await bot_instance.get_chat_member(channel_id, bot_instance.me.id)
-
-            if member.privileges:
-                status_report += f"✅ {create_channel_mention(channel_name, channel_id)}: Working Properly\n"
-            else:
-                status_report += f"⚠️ {create_channel_mention(channel_name, channel_id)}: Admin Rights Needed\n"
-                channels_operational = False
-
-        except ChatAdminRequired:
-            status_report += f"⚠️ {create_channel_mention(channel_name, channel_id)}: Admin Rights Needed\n"
-            channels_operational = False
-
-        except (PeerIdInvalid, ValueError):
-            status_report += f"🗣 {create_channel_mention(channel_name, channel_id)}: Needs Interaction\n"
-            channels_operational = False
-
-        except FloodWait as e:
-            await asyncio.sleep(e.value)
-        except Exception as e:
-            LOGGER.error(f"Unexpected error checking channel {channel_name}: {type(e)} {str(e)}")
-            status_report += f"❌ {create_channel_mention(channel_name, channel_id)}: Error checking status: {e}\n"
-            channels_operational = False
-
-    if not channels_operational:  # Append instructions if any channel has issues
-        status_report += get_instruction_message()  # Assuming this function is defined elsewhere
-
-    return status_report, channels_operational
+    channel_statuses = await probe_channels(channel['id'] for channel in admin_channels)
+    return build_status_report(admin_channels, channel_statuses, "All Channels Status Report 📝\n")
 
 async def check_status(admin_id: int = None) -> Tuple[Dict[int, str], bool]:
     """
     Checks the bot's access status for all channels/groups, optionally grouped by a specific admin.
-    Returns a dictionary where keys are admin IDs and values are status messages,
-    and a boolean indicating if all channels are operational.
+    Every channel is probed once (in parallel), even when several admins share it,
+    and the results are fanned out into the per-admin reports.
     
     Args:
         admin_id (int, optional): The ID of the specific admin to check (default: None).
@@ -158,29 +195,27 @@ async def check_status(admin_id: int = None) -> Tuple[Dict[int, str], bool]:
         admin_status_reports = {}
         all_channels_operational = True
 
-        with next(get_db()) as session:
-            if admin_id:
-                # Fetch a specific admin and their channels
-                admin = list_admins(session, admin_id)
-                print(f"Admin Id given and list size {len(admin)}")
-                if not admin:
-                    LOGGER.warning(f"No admin found with ID: {admin_id}")
-                    return {}, False  # Return empty dict and False if admin not found
-                admins = admin # Single entry is needed to be made as list
-            else:
-                # Fetch all admins
-                print(f"Admin Id is not given")
-                admins = list_admins(session)
-                print(f"size of admins list - {list_admins}")
-
-            for admin in admins:
-                admin_id = admin['admin_id']
-                admin_channels = admin['channels']
-                status_report, channels_operational = await check_admin_status(admin_id, admin_channels)
-
-                admin_status_reports[admin_id] = status_report
-                all_channels_operational = channels_operational
-                print(f"is it fine - {all_channels_operational}")
+        if admin_id:
+            # Fetch a specific admin and their channels
+            admins = await run_db(list_admins, admin_id)
+            if not admins:
+                LOGGER.warning(f"No admin found with ID: {admin_id}")
+                return {}, False  # Return empty dict and False if admin not found
+        else:
+            # Fetch all admins
+            admins = await run_db(list_admins)
+
+        channel_statuses = await probe_channels(
+            channel['id'] for admin in admins for channel in admin['channels']
+        )
+        LOGGER.info(f"Checked {len(channel_statuses)} channels for {len(admins)} admins")
+
+        for admin in admins:
+            status_report, channels_operational = build_status_report(
+                admin['channels'], channel_statuses, "All Channels Status Report 📝\n"
+            )
+            admin_status_reports[admin['admin_id']] = status_report
+            all_channels_operational = all_channels_operational and channels_operational
         return admin_status_reports, all_channels_operational
     except Exception as e:
         LOGGER.error(f"Error in check_status: {e}")
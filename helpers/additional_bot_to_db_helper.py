@@ -1,7 +1,6 @@
 from bot.bot_instance import get_bot_instance
 from utils.logger import LOGGER
-import asyncio
-from pyrogram.errors import FloodWait, ChatAdminRequired, UserNotParticipant, PeerIdInvalid, UserBannedInChannel
+from pyrogram.errors import ChatAdminRequired, UserNotParticipant, PeerIdInvalid, UserBannedInChannel
 
 
 #--------------------------------- Kick and unban user 
@@ -10,6 +9,8 @@ from pyrogram.errors import FloodWait, ChatAdminRequired, UserNotParticipant, Pe
 async def kick_and_unban_user(user_id: int, chat_id: int):
     """
     Kicks a user from a channel and then unbans them.
+    FloodWait is waited out by the API governor, it only reaches the caller once the governor gives up.
+    Errors other than UserNotParticipant are raised, so callers can retry the removal.
 
     Args:
         chat_id: The ID of the channel.
@@ -21,18 +22,10 @@ async def kick_and_unban_user(user_id: int, chat_id: int):
         await bot_instance.ban_chat_member(chat_id, user_id)
         LOGGER.info(f"User {user_id} kicked from channel {chat_id}")
 
-        # Briefly pause to avoid potential rate limiting (optional)
-        await asyncio.sleep(1)
-
         # Unban the user from the channel
         await bot_instance.unban_chat_member(chat_id, user_id)
         LOGGER.info(f"User {user_id} unbanned from channel {chat_id}")
 
-    except FloodWait as e:
-        LOGGER.error(f"Flood wait triggered. Sleeping for {e.value} seconds.")
-        await asyncio.sleep(e.value)
-        await kick_and_unban_user(chat_id, user_id)  # Retry after flood wait
-
     except ChatAdminRequired:
         LOGGER.error(f"Bot needs admin rights in channel {chat_id} to perform remove the user action.")
         raise ChatAdminRequired(f"Bot needs admin rights in channel {chat_id} to perform remove the user action.")
@@ -51,4 +44,5 @@ async def kick_and_unban_user(user_id: int, chat_id: int):
 
     except Exception as e:
         LOGGER.error(f"An unexpected error occurred: {e}")
+        raise
 
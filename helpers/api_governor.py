@@ -0,0 +1,128 @@
+import asyncio
+import time
+from pyrogram.errors import FloodWait
+from utils.config import Config
+from utils.logger import LOGGER
+
+# A call that keeps hitting FloodWait is retried this many times before the FloodWait is raised
+MAX_FLOOD_WAIT_RETRIES = 3
+
+# Idle per-chat buckets are dropped once this many chats are tracked
+CHAT_BUCKETS_PRUNE_AT = 1000
+
+
+class TokenBucket:
+    """
+    Async token bucket, `rate` tokens per second with bursts of up to `capacity`.
+    pause() empties it for a while, used when Telegram answers with FloodWait.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_idle(self, now: float) -> bool:
+        """Refilled to capacity with nobody waiting, i.e. no different from a new bucket."""
+        return (not self._lock.locked() and now >= self.paused_until
+                and self.tokens + (now - self.updated) * self.rate >= self.capacity)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        # Waiters queue up on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ApiGovernor:
+    """
+    Single gate for the bot's outbound Telegram calls (wired into the Bot client, see bot/__init__.py).
+
+    - every call takes a token from the global bucket and from its chat's bucket
+    - a FloodWait pauses the global bucket, so every caller backs off, not just the one that tripped it,
+      then the call is retried (up to MAX_FLOOD_WAIT_RETRIES times)
+    - counts calls, time spent throttled and FloodWaits per method
+    - per-chat buckets that have refilled are forgotten once CHAT_BUCKETS_PRUNE_AT chats are tracked
+    """
+
+    def __init__(self, global_rate: float = Config.TG_GLOBAL_RATE, global_burst: int = Config.TG_GLOBAL_BURST,
+                 per_chat_rate: float = Config.TG_PER_CHAT_RATE, per_chat_burst: int = Config.TG_PER_CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self._chat_buckets = {}
+        self._prune_at = CHAT_BUCKETS_PRUNE_AT
+        self.calls = {}
+        self.throttled_seconds = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.gave_up = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        if chat_id not in self._chat_buckets:
+            if len(self._chat_buckets) >= self._prune_at:
+                self._prune_chat_buckets()
+            self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return self._chat_buckets[chat_id]
+
+    def _prune_chat_buckets(self):
+        # Dropping an idle bucket loses nothing, a new one starts out full too
+        now = time.monotonic()
+        self._chat_buckets = {chat_id: bucket for chat_id, bucket in self._chat_buckets.items() if not bucket.is_idle(now)}
+        # Chats that are all busy are kept, pruning again only after the map has doubled keeps this amortised O(1)
+        self._prune_at = max(CHAT_BUCKETS_PRUNE_AT, 2 * len(self._chat_buckets))
+
+    async def call(self, chat_id, method, *args, **kwargs):
+        """
+        Runs `await method(*args, **kwargs)` within the rate budgets.
+        Usage - await API_GOVERNOR.call(chat_id, super().send_message, chat_id, text)
+        """
+        name = getattr(method, "__name__", str(method))
+        self.calls[name] = self.calls.get(name, 0) + 1
+        for attempt in range(MAX_FLOOD_WAIT_RETRIES + 1):
+            started = time.monotonic()
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            self.throttled_seconds += time.monotonic() - started
+            try:
+                return await method(*args, **kwargs)
+            except FloodWait as e:
+                self.flood_waits += 1
+                self.flood_wait_seconds += e.value
+                LOGGER.warning(f"FloodWait of {e.value}s on {name} (chat {chat_id}), pausing all outbound calls")
+                self.global_bucket.pause(e.value)
+                if attempt == MAX_FLOOD_WAIT_RETRIES:
+                    self.gave_up += 1
+                    raise
+
+    def stats(self) -> dict:
+        stats = {
+            "total_calls": sum(self.calls.values()),
+            "throttled_seconds": self.throttled_seconds,
+            "flood_waits": self.flood_waits,
+            "flood_wait_seconds": self.flood_wait_seconds,
+            "gave_up": self.gave_up,
+            "paused_for_seconds": max(0.0, self.global_bucket.paused_until - time.monotonic()),
+            "tracked_chats": len(self._chat_buckets),
+        }
+        stats.update({f"calls.{name}": count for name, count in sorted(self.calls.items())})
+        return stats
+
+
+API_GOVERNOR = ApiGovernor()
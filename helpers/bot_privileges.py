@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from pyrogram.enums import ChatMemberStatus
+from bot.bot_instance import get_bot_instance
+from utils.config import Config
+from utils.logger import LOGGER
+
+# Writes of the persisted cache are batched over this many seconds
+SAVE_DELAY_SECONDS = 5
+
+# Fields of pyrogram's ChatPrivileges kept in the cache
+PRIVILEGE_FIELDS = (
+    "can_manage_chat", "can_delete_messages", "can_manage_video_chats", "can_restrict_members",
+    "can_promote_members", "can_change_info", "can_post_messages", "can_edit_messages",
+    "can_invite_users", "can_pin_messages", "is_anonymous",
+)
+
+
+class BotMemberStatus:
+    """The bot's status and privileges in one chat, shaped like the parts of ChatMember the plugins read."""
+    __slots__ = ("status", "privileges", "fetched_at")
+
+    def __init__(self, status: ChatMemberStatus, privileges: dict = None, fetched_at: float = None):
+        self.status = status
+        self.privileges = SimpleNamespace(**privileges) if privileges else None
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    @classmethod
+    def from_chat_member(cls, member):
+        privileges = None
+        if member.privileges:
+            privileges = {field: bool(getattr(member.privileges, field, False)) for field in PRIVILEGE_FIELDS}
+        return cls(member.status, privileges)
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status.value,
+            "privileges": vars(self.privileges) if self.privileges else None,
+            "fetched_at": self.fetched_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(ChatMemberStatus(data["status"]), data["privileges"], data["fetched_at"])
+
+
+class BotPrivilegeCache:
+    """
+    The bot's own status/privileges per chat, so permission checks don't cost a get_chat_member call.
+
+    Kept current by ChatMemberUpdated events about the bot (see bot/plugins/channel_handler.py),
+    entries older than `ttl` are re-fetched lazily on the next lookup. When `path` is set
+    the map is also stored there as JSON, so it survives restarts.
+    """
+
+    def __init__(self, ttl: float, path: str = None):
+        self.ttl = ttl
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.fetches = 0
+        self._save_task = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            with self._lock:
+                for chat_id, entry in data.items():
+                    self._entries[int(chat_id)] = BotMemberStatus.from_dict(entry)
+            LOGGER.info(f"Loaded bot privileges for {len(data)} chats from {self.path}")
+        except (OSError, ValueError, KeyError) as e:
+            LOGGER.error(f"Could not load bot privileges from {self.path}: {e}")
+
+    def _write(self, data: dict):
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            LOGGER.error(f"Could not save bot privileges to {self.path}: {e}")
+
+    async def _save_later(self):
+        # Changes arriving within SAVE_DELAY_SECONDS are written together, off the event loop
+        await asyncio.sleep(SAVE_DELAY_SECONDS)
+        self._save_task = None
+        with self._lock:
+            data = {str(chat_id): entry.to_dict() for chat_id, entry in self._entries.items()}
+        await asyncio.to_thread(self._write, data)
+
+    def _save(self):
+        if not self.path or self._save_task is not None:
+            return
+        try:
+            self._save_task = asyncio.get_running_loop().create_task(self._save_later())
+        except RuntimeError:
+            # No event loop (scripts), write right away
+            with self._lock:
+                data = {str(chat_id): entry.to_dict() for chat_id, entry in self._entries.items()}
+            self._write(data)
+
+    def set(self, chat_id: int, entry: BotMemberStatus):
+        self._load()
+        with self._lock:
+            self._entries[chat_id] = entry
+        self._save()
+
+    def invalidate(self, chat_id: int):
+        with self._lock:
+            removed = self._entries.pop(chat_id, None)
+        if removed is not None:
+            self._save()
+
+    def update_from_member(self, chat_id: int, member):
+        """Applies a ChatMemberUpdated about the bot. `member` is None when the bot left the chat."""
+        entry = BotMemberStatus.from_chat_member(member) if member else BotMemberStatus(ChatMemberStatus.LEFT)
+        self.set(chat_id, entry)
+        LOGGER.info(f"Bot status in chat {chat_id} is now {entry.status.value}")
+
+    async def get(self, chat_id: int, refresh: bool = False) -> BotMemberStatus:
+        """
+        The bot's status in `chat_id`, from the cache unless missing, older than the TTL or `refresh`.
+        Errors of get_chat_member (ChatAdminRequired, PeerIdInvalid, ...) are raised as usual.
+        """
+        self._load()
+        with self._lock:
+            entry = self._entries.get(chat_id)
+        if entry is not None and not refresh and time.time() - entry.fetched_at < self.ttl:
+            self.hits += 1
+            return entry
+
+        bot_instance = await get_bot_instance()
+        member = await bot_instance.get_chat_member(chat_id, bot_instance.me.id)
+        self.fetches += 1
+        entry = BotMemberStatus.from_chat_member(member)
+        self.set(chat_id, entry)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"chats": len(self._entries), "hits": self.hits, "fetches": self.fetches}
+
+
+BOT_PRIVILEGES = BotPrivilegeCache(Config.BOT_PRIVILEGES_TTL, Config.BOT_PRIVILEGES_FILE)
@@ -0,0 +1,136 @@
+from pyrogram.errors import PeerIdInvalid, ChatAdminRequired
+from db.executor import run_db
+from db.subscription_helpers import claim_expired_subscriptions, restore_subscriptions
+from db.kick_retry_helpers import enqueue_kick_retries, claim_kick_retry_channels, load_kick_retries, complete_kick_retries
+from db.user_helpers import remove_orphaned_users
+from helpers.kick_pipeline import KickPipeline
+from utils.logger import LOGGER
+
+EXPIRY_BATCH_SIZE = 500
+
+
+async def _kick_batch(pipeline: KickPipeline, batch):
+    """Removes every member of a claimed batch from its chat, returns (removed, errors)."""
+    removed, errors = [], []
+    for subscription, error in await pipeline.run(batch):
+        if error is None:
+            removed.append(subscription)
+        elif isinstance(error, ChatAdminRequired):
+            errors.append((subscription, "Bot should be admin in this channel to remove users. Removal will be retried once it is."))
+        elif isinstance(error, (PeerIdInvalid, ValueError)):
+            errors.append((subscription, "Let there be some interaction in the channel before using this feature. Removal will be retried."))
+        else:
+            errors.append((subscription, f"{error}. Removal will be retried."))
+    return removed, errors
+
+
+async def _queue_failed_kicks(errors):
+    """Hands a batch's failed removals to the kick retry queue, or puts the subscriptions back if that fails."""
+    try:
+        await run_db(enqueue_kick_retries, errors)
+    except Exception:
+        # Don't lose them, the next expiry run claims them again
+        restored = await run_db(restore_subscriptions, [subscription for subscription, _ in errors])
+        LOGGER.info(f"Restored {restored} expired subscriptions whose members could not be removed")
+
+
+async def expire_subscriptions(admin_id: int = None, batch_size: int = EXPIRY_BATCH_SIZE):
+    """
+    Removes all expired members, one claimed batch at a time, yielding progress after each batch.
+
+    Each batch is deleted from `subscriptions` up front (DELETE ... RETURNING, walking idx_expiry_date
+    by keyset), then the members are kicked concurrently through a KickPipeline. Members whose kick failed are written
+    to the kick retry queue (see retry_failed_kicks) before the next batch is claimed, so a run that dies midway loses
+    at most the batch in flight. A single orphan cleanup runs over the users removed.
+
+    Usage -
+        async for progress in expire_subscriptions(admin_id):
+            ...
+
+    Yields:
+        Dict: batch number, the batch's `removed` subscriptions and `errors` as (subscription, message),
+              running totals `total_claimed`, `total_removed`, `total_failed`
+              and the pipeline's `kick_stats` (kicks per second, FloodWait sleep)
+    """
+    after = None
+    batch_number = 0
+    total_claimed = total_removed = 0
+    total_failed = 0
+    removed_user_ids = set()
+    pipeline = KickPipeline()
+
+    try:
+        while True:
+            batch = await run_db(claim_expired_subscriptions, after, admin_id, batch_size)
+            if not batch:
+                break
+
+            batch_number += 1
+            after = (batch[-1]['expiry_date'], batch[-1]['subscription_id'])
+
+            removed, errors = await _kick_batch(pipeline, batch)
+            removed_user_ids.update(subscription['user_id'] for subscription in removed)
+            if errors:
+                await _queue_failed_kicks(errors)
+            total_failed += len(errors)
+            total_claimed += len(batch)
+            total_removed += len(removed)
+
+            yield {
+                'batch': batch_number,
+                'removed': removed,
+                'errors': errors,
+                'total_claimed': total_claimed,
+                'total_removed': total_removed,
+                'total_failed': total_failed,
+                'kick_stats': pipeline.stats(),
+            }
+
+            if len(batch) < batch_size:
+                break
+    finally:
+        if removed_user_ids:
+            await run_db(remove_orphaned_users, removed_user_ids)
+        kick_stats = pipeline.stats()
+        LOGGER.info(
+            f"Expiry run finished: {total_removed}/{total_claimed} members removed in {batch_number} batches, "
+            f"{kick_stats['kicks_per_second']:.1f} kicks/s, {kick_stats['flood_waits']} FloodWaits "
+            f"({kick_stats['flood_wait_seconds']:.0f}s of chat pauses)"
+        )
+
+
+async def retry_failed_kicks(channel_id: int = None):
+    """
+    Works off the kick retry queue, one due channel at a time (or just `channel_id` if it is due).
+    A channel where any removal fails again is backed off exponentially; removals that did go
+    through leave the queue either way.
+
+    Usage -
+        async for result in retry_failed_kicks():
+            ...
+
+    Yields:
+        Dict: channel_id, the `removed` members, `errors` as (member, message) and `remaining` members still queued
+    """
+    pipeline = KickPipeline()
+    removed_user_ids = set()
+    try:
+        for channel in await run_db(claim_kick_retry_channels, channel_id):
+            members = await run_db(load_kick_retries, channel['channel_id'])
+            removed, errors = await _kick_batch(pipeline, members) if members else ([], [])
+            removed_user_ids.update(member['user_id'] for member in removed)
+            remaining = await run_db(
+                complete_kick_retries,
+                channel['channel_id'],
+                [member['user_id'] for member in removed],
+                errors[-1][1] if errors else None
+            )
+            if errors:
+                LOGGER.warning(
+                    f"Kick retry in channel {channel['channel_id']}: {len(removed)} removed, {len(errors)} failed "
+                    f"(round {channel['failures'] + 1}), backing off"
+                )
+            yield {'channel_id': channel['channel_id'], 'removed': removed, 'errors': errors, 'remaining': remaining}
+    finally:
+        if removed_user_ids:
+            await run_db(remove_orphaned_users, removed_user_ids)
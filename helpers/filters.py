@@ -1,5 +1,5 @@
 from pyrogram import Client, filters
-from pyrogram.types import Message
+from pyrogram.types import Message, ChatMemberUpdated
 from utils.config import Config
 from bot import Bot
 
@@ -45,6 +45,10 @@ def calling_bot(bot: Bot, _, message: Message) -> bool:
 def channel_or_group_anonymous_messages(_, __, message: Message) -> bool:
     return True if message.sender_chat else False
 
+# ChatMemberUpdated about the bot itself (promoted, restricted, removed ...)
+def bot_member_updates(_, __, update: ChatMemberUpdated) -> bool:
+    member = update.new_chat_member or update.old_chat_member
+    return bool(member and member.user and member.user.is_self)
 
 
 
@@ -60,4 +64,6 @@ is_new_user_updating = filters.create(is_new_user_update_state_chats)
 is_deleting_channel_links_filter = filters.create(is_deleting_channel_links)
 
 whitelisted_chats_filter = filters.create(whitelisted_chats)
-blacklisted_chats_filter = filters.create(blacklisted_chats)
\ No newline at end of file
+blacklisted_chats_filter = filters.create(blacklisted_chats)
+
+bot_member_updated_filter = filters.create(bot_member_updates)
\ No newline at end of file
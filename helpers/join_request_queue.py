@@ -0,0 +1,97 @@
+import asyncio
+import time
+from collections import deque
+from utils.config import Config
+from utils.logger import LOGGER
+
+# Recent time-to-approval samples kept for the percentiles in stats()
+LATENCY_SAMPLES = 500
+
+
+class JoinRequestQueue:
+    """
+    Buffers chat join requests and works them off with a pool of its own workers, so a burst of
+    requests (an invite link shared widely) doesn't hold Pyrogram's update workers and starve admin commands.
+
+    The handler only calls submit() and returns. A worker then runs the registered processor, which
+    approves the request first and leaves the notifications to the outbox dispatcher.
+
+    Usage -
+        JOIN_REQUEST_QUEUE.set_processor(process_join_request)   # async def process_join_request(client, request, mark_approved)
+        await JOIN_REQUEST_QUEUE.submit(client, request)
+    """
+
+    def __init__(self, workers: int = Config.JOIN_REQUEST_WORKERS, maxsize: int = Config.JOIN_REQUEST_QUEUE_SIZE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._processor = None
+        self._queue = None
+        self._tasks = []
+        self.submitted = 0
+        self.processed = 0
+        self.approved = 0
+        self.failures = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.total_wait_seconds = 0.0
+        self._approval_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def set_processor(self, processor):
+        self._processor = processor
+
+    def _ensure_started(self):
+        # Started on first use, from inside the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            LOGGER.info(f"Join request queue started with {self.workers} workers")
+
+    async def submit(self, client, request):
+        """Queues a join request. Only waits when the queue is full, that back pressure falls on the update worker."""
+        self._ensure_started()
+        item = (client, request, time.monotonic())
+        self.submitted += 1
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            LOGGER.warning(f"Join request queue is full ({self.maxsize}), waiting for a free slot")
+            await self._queue.put(item)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def _worker(self):
+        while True:
+            client, request, enqueued_at = await self._queue.get()
+            self.total_wait_seconds += time.monotonic() - enqueued_at
+
+            def mark_approved():
+                self.approved += 1
+                self._approval_latencies.append(time.monotonic() - enqueued_at)
+
+            try:
+                await self._processor(client, request, mark_approved)
+            except Exception as e:
+                self.failures += 1
+                LOGGER.error(f"Error processing join request of user {request.from_user.id} in chat {request.chat.id}: {e}")
+            finally:
+                self.processed += 1
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        latencies = sorted(self._approval_latencies)
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.max_depth,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "approved": self.approved,
+            "failures": self.failures,
+            "overflows": self.overflows,
+            "avg_queue_wait_ms": round(self.total_wait_seconds / self.processed * 1000, 1) if self.processed else 0.0,
+            "avg_time_to_approval_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "p95_time_to_approval_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0.0,
+        }
+
+
+JOIN_REQUEST_QUEUE = JoinRequestQueue()
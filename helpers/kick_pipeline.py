@@ -0,0 +1,109 @@
+import asyncio
+import time
+from pyrogram.errors import FloodWait
+from helpers.additional_bot_to_db_helper import kick_and_unban_user
+from helpers.api_governor import TokenBucket
+from utils.config import Config
+from utils.logger import LOGGER
+
+
+class KickPipeline:
+    """
+    Removes members concurrently: a bounded pool of workers and a token bucket per chat so no single
+    chat is hammered. The ban/unban calls go through the API governor, which waits out and retries
+    FloodWaits globally; a FloodWait that still reaches the pipeline pauses the chat and fails that kick.
+
+    One instance is meant to live for a whole run (e.g. one expiry run), so the per-chat
+    budgets and the counters carry over between batches.
+
+    Usage -
+        pipeline = KickPipeline()
+        results = await pipeline.run(subscriptions)   # [(subscription, error or None), ...]
+        pipeline.stats()   # flood_waits/flood_wait_seconds: the FloodWaits that failed this pipeline's kicks
+    """
+
+    def __init__(self, workers: int = Config.KICK_WORKERS, rate_per_chat: float = Config.KICK_RATE_PER_CHAT,
+                 burst_per_chat: int = Config.KICK_BURST_PER_CHAT):
+        self.workers = workers
+        self.rate_per_chat = rate_per_chat
+        self.burst_per_chat = burst_per_chat
+        self._buckets = {}
+        self.kicks = 0
+        self.failures = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self._buckets:
+            self._buckets[chat_id] = TokenBucket(self.rate_per_chat, self.burst_per_chat)
+        return self._buckets[chat_id]
+
+    async def _kick(self, subscription: dict):
+        """
+        Kicks one member. Returns the exception that made it fail, or None.
+        FloodWait is retried by the API governor only; one it gives up on fails the kick and pauses the chat here.
+        """
+        bucket = self._bucket(subscription['channel_id'])
+        await bucket.acquire()
+        try:
+            await kick_and_unban_user(subscription['user_id'], subscription['channel_id'])
+            self.kicks += 1
+            return None
+        except FloodWait as e:
+            self.flood_waits += 1
+            self.flood_wait_seconds += e.value
+            LOGGER.warning(f"FloodWait of {e.value}s in chat {subscription['channel_id']} outlasted the governor's retries, pausing kicks there")
+            bucket.pause(e.value)
+            self.failures += 1
+            return e
+        except Exception as e:
+            self.failures += 1
+            return e
+
+    @staticmethod
+    def _interleave_by_chat(subscriptions: list) -> list:
+        """Round-robin over chats, so workers spread over all chats instead of queueing on one bucket."""
+        by_chat = {}
+        for subscription in subscriptions:
+            by_chat.setdefault(subscription['channel_id'], []).append(subscription)
+        queues = list(by_chat.values())
+        ordered = []
+        for position in range(max((len(queue) for queue in queues), default=0)):
+            ordered.extend(queue[position] for queue in queues if position < len(queue))
+        return ordered
+
+    async def run(self, subscriptions: list) -> list:
+        """
+        Kicks every subscription's member from its chat.
+
+        Returns:
+            List[Tuple]: (subscription, exception or None) for every input, in input order
+        """
+        errors = {}
+        queue = asyncio.Queue()
+        for subscription in self._interleave_by_chat(subscriptions):
+            queue.put_nowait(subscription)
+
+        async def worker():
+            while True:
+                try:
+                    subscription = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                errors[id(subscription)] = await self._kick(subscription)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(subscriptions)))))
+        self.busy_seconds += time.monotonic() - started
+        return [(subscription, errors.get(id(subscription))) for subscription in subscriptions]
+
+    def stats(self) -> dict:
+        return {
+            "kicks": self.kicks,
+            "failures": self.failures,
+            "kicks_per_second": self.kicks / self.busy_seconds if self.busy_seconds else 0.0,
+            "flood_waits": self.flood_waits,
+            "flood_wait_seconds": self.flood_wait_seconds,
+            "busy_seconds": self.busy_seconds,
+        }
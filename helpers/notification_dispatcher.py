@@ -0,0 +1,126 @@
+import asyncio
+from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.bot_instance import get_bot_instance
+from db.executor import run_db
+from db.outbox_helpers import claim_notifications, mark_notifications_sent, mark_notifications_failed
+from helpers.text_helper import split_message, pack_messages, MAX_MESSAGE_LENGTH
+from utils.config import Config
+from utils.logger import LOGGER
+
+_wake_event = None
+
+
+def wake_dispatcher():
+    """Called by producers after committing notifications, so they go out without waiting for the next poll."""
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+def _build_markup(buttons):
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=callback_data) for text, callback_data in row]
+        for row in buttons
+    ])
+
+
+def _pack_notifications(notifications: list) -> list:
+    """
+    Packs one chat's notifications into as few messages as possible, in order (see pack_messages).
+    Notifications with buttons or longer than one message are sent on their own.
+
+    Returns:
+        List[Tuple]: (notification ids, message chunks, reply markup)
+    """
+    packs = []
+    run = []  # Consecutive notifications that can share messages
+    for notification in notifications + [None]:
+        if notification is not None and not notification['buttons'] and len(notification['text']) <= MAX_MESSAGE_LENGTH:
+            run.append(notification)
+            continue
+        if run:
+            packs.append(([item['id'] for item in run], pack_messages([item['text'] for item in run]), None))
+            run = []
+        if notification is not None:
+            packs.append(([notification['id']], split_message(notification['text']), _build_markup(notification['buttons'])))
+    return packs
+
+
+async def _deliver_chat(bot_instance, chat_id: int, notifications: list, sent: list, failed: list):
+    packs = _pack_notifications(notifications)
+    for idx, (notification_ids, chunks, reply_markup) in enumerate(packs):
+        try:
+            for chunk_idx, chunk in enumerate(chunks, start=1):
+                # Buttons go on the last chunk
+                await bot_instance.send_message(chat_id, chunk, reply_markup=reply_markup if chunk_idx == len(chunks) else None)
+            sent.extend(notification_ids)
+        except Exception as e:
+            LOGGER.warning(f"Delivering notifications {notification_ids} to chat {chat_id} failed: {e}")
+            # Keep the chat's order, everything after the failure is retried along with it
+            for remaining_ids, _, _ in packs[idx:]:
+                failed.extend((notification_id, str(e)) for notification_id in remaining_ids)
+            return
+
+
+async def dispatch_notifications() -> int:
+    """
+    Drains the outbox, OUTBOX_BATCH_SIZE notifications at a time. Chats are served concurrently,
+    each chat's notifications in order and coalesced into as few messages as possible.
+    Failures are retried later with backoff (see db/outbox_helpers.py).
+
+    Returns:
+        int: Number of notifications delivered
+    """
+    bot_instance = await get_bot_instance()
+    delivered = 0
+    while True:
+        batch = await run_db(claim_notifications, Config.OUTBOX_BATCH_SIZE)
+        if not batch:
+            break
+
+        by_chat = {}
+        for notification in batch:
+            by_chat.setdefault(notification['chat_id'], []).append(notification)
+
+        sent, failed = [], []
+        await asyncio.gather(*(
+            _deliver_chat(bot_instance, chat_id, notifications, sent, failed)
+            for chat_id, notifications in by_chat.items()
+        ))
+
+        if sent:
+            await run_db(mark_notifications_sent, sent)
+            delivered += len(sent)
+        if failed:
+            attempts = {notification['id']: notification['attempts'] for notification in batch}
+            await run_db(mark_notifications_failed, [
+                (notification_id, attempts[notification_id], error) for notification_id, error in failed
+            ])
+
+        if len(batch) < Config.OUTBOX_BATCH_SIZE:
+            break
+    return delivered
+
+
+async def run_notification_dispatcher():
+    """
+    Long running task: drains the outbox whenever woken by a producer, and at least every
+    OUTBOX_POLL_SECONDS to pick up retries and notifications enqueued by other processes.
+    """
+    global _wake_event
+    _wake_event = asyncio.Event()
+    LOGGER.info("Notification dispatcher started")
+    while True:
+        try:
+            delivered = await dispatch_notifications()
+            if delivered:
+                LOGGER.info(f"Delivered {delivered} notifications from the outbox")
+        except Exception as e:
+            LOGGER.error(f"Error in notification dispatcher : {e}")
+
+        try:
+            await asyncio.wait_for(_wake_event.wait(), timeout=Config.OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake_event.clear()
@@ -1,23 +1,66 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from pyrogram.errors import PeerIdInvalid, ChatAdminRequired
 from datetime import datetime
-from db.connection import get_db
+from db.executor import run_db
 from db.admin_helpers import get_admin_for_channel, list_admins
-from db.subscription_helpers import fetch_soon_to_expire_subscriptions, fetch_expired_subscriptions
-from helpers.text_helper import send_long_message, create_user_mention, create_channel_mention
+from db.subscription_helpers import fetch_soon_to_expire_subscriptions
+from db.user_helpers import remove_extra_users_chunk
+from db.verification_helpers import purge_expired_verification_codes_chunk
+from db.outbox_helpers import add_notifications, purge_sent_notifications
+from helpers.text_helper import create_user_mention, create_channel_mention
+from helpers.notification_dispatcher import run_notification_dispatcher, wake_dispatcher
 from helpers.additional_bot_helpers import check_status
-from helpers.additional_bot_to_db_helper import kick_and_unban_user
-from bot.bot_instance import get_bot_instance
-from db.user_helpers import delete_user_from_channel
+from helpers.expiry_engine import expire_subscriptions, retry_failed_kicks
 from utils.config import Config
 from utils.logger import LOGGER
 from datetime import timedelta
+import asyncio
+
+# Full orphan-user sweep, a safety net behind the targeted cleanups
+ORPHAN_SWEEP_INTERVAL_HOURS = 12
+ORPHAN_SWEEP_CHUNK_SIZE = 1000
+ORPHAN_SWEEP_PAUSE_SECONDS = 0.5
+
+CODE_PURGE_INTERVAL_MINUTES = 30
+CODE_PURGE_CHUNK_SIZE = 1000
+
+OUTBOX_PURGE_CHUNK_SIZE = 1000
+
+KICK_RETRY_INTERVAL_MINUTES = 10
+
+# Keeps references to the dispatcher and other background tasks, asyncio only holds weak ones
+_dispatcher_task = None
+_background_tasks = set()
+
+async def _enqueue(notifications: list):
+    """Hands (chat_id, text, idempotency_key) tuples to the outbox, the dispatcher delivers them."""
+    if notifications and await run_db(add_notifications, notifications):
+        wake_dispatcher()
+
+
+def _expiry_report(removed: list, errors: list) -> str:
+    message = "Users that have been removed due to expired subscriptions:\n\n"
+    for user_id, user_fullname in removed:
+        user_mention = create_user_mention(user_id, user_fullname)
+        message += f"{user_mention}\n\n"
+
+    if errors:
+        message += "\nErrors occurred while removing users:\n\n"
+        for error_message in errors:
+            message += f"{error_message}\n\n"
+    return message
+
 
 async def daily_routine(admin_id: int = None):
+    """
+    Reports are enqueued in the notification outbox rather than sent inline. Idempotency keys
+    carry the run id, or the date for the soon-to-expire reminders so a rerun on the same day
+    (e.g. /cleanusers) doesn't repeat them.
+    """
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    today = datetime.now().date()
     try:
         LOGGER.info("Daily routine started")
         
-        bot_instance = await get_bot_instance()
         LOGGER.info("Entering Checking status")
         admin_status_reports, can_proceed = await check_status(admin_id) # Get admin-specific status reports
         LOGGER.info("Completed Checking status")
@@ -26,114 +69,177 @@ async def daily_routine(admin_id: int = None):
         # If admin_id is provided, only process for that admin
         if admin_id:
             if admin_id in admin_status_reports:
-                await send_long_message(bot_instance, admin_id, admin_status_reports[admin_id])
+                await _enqueue([(admin_id, admin_status_reports[admin_id], f"status:{run_id}:{admin_id}")])
             else:
                 LOGGER.warning(f"No status report found for admin_id: {admin_id}")
         elif admin_id is None:
             # Process all admins if no specific admin_id is provided
-            for admin_id, status_report in admin_status_reports.items():
-                await send_long_message(bot_instance, admin_id, status_report)
+            await _enqueue([
+                (report_admin_id, status_report, f"status:{run_id}:{report_admin_id}")
+                for report_admin_id, status_report in admin_status_reports.items()
+            ])
 
         if can_proceed:
-            with next(get_db()) as session:
-                # Fetch and process soon to expire subscriptions
-                LOGGER.info("Trying to fetch soon to expire subscriptions")
-                soon_to_expire = fetch_soon_to_expire_subscriptions(session, admin_id)
-                LOGGER.info("Done fetching soon to expire subscriptions")
-                
-                # Group subscriptions by channel
-                channel_subscriptions = {}
-                for subscription in soon_to_expire:
-                    channel_id = subscription.channel.channel_id
-                    if channel_id not in channel_subscriptions:
-                        channel_subscriptions[channel_id] = []
-                    channel_subscriptions[channel_id].append(subscription)
-                
-                # Send notifications to relevant channel admins
-                for channel_id, subscriptions in channel_subscriptions.items():
-                    message = "Subscriptions that are soon to expire:\n\n"
-                    for subscription in subscriptions:
-                        user_mention = create_user_mention(subscription.user.user_id, subscription.user.fullname)
-                        channel_mention = create_channel_mention(subscription.channel.channel_name, subscription.channel.channel_id)
-                        message += f"User: {user_mention}, Channel: {channel_mention}\n Expiry Date: {subscription.expiry_date}\n\n"
-                    
-                    # Get admins for this channel and send them the message
-                    channel_admins = get_admin_for_channel(session, channel_id)
-                    for admin in channel_admins:
-                        await send_long_message(bot_instance, admin.admin_id, message)
-                
-                # Handle expired subscriptions
-                expired_subscriptions = fetch_expired_subscriptions(session, admin_id)
-                
-                if expired_subscriptions:
-                    # Group expired subscriptions by channel
-                    expired_by_channel = {}
-                    for subscription in expired_subscriptions:
-                        channel_id = subscription['channel_id']
-                        if channel_id not in expired_by_channel:
-                            expired_by_channel[channel_id] = []
-                        expired_by_channel[channel_id].append(subscription)
-                    
-                    # Process each channel's expired subscriptions
-                    for channel_id, channel_expired in expired_by_channel.items():
-                        expired_users = []
-                        error_messages = []
-                        
-                        # Process removals
-                        for subscription in channel_expired:
-                            try:
-                                await kick_and_unban_user(subscription['user_id'], channel_id)
-                                if delete_user_from_channel(session, subscription['user_id'], channel_id):
-                                    expired_users.append((subscription['user_id'], subscription['user_fullname']))
-                                else:
-                                    error_messages.append(
-                                        f"Error removing user {subscription['user_id']} from channel {channel_id}: "
-                                        f"Failed to remove from database."
-                                    )
-                            except ChatAdminRequired:
-                                error_messages.append(
-                                    f"Error removing user {subscription['user_id']} from channel {channel_id}: "
-                                    f"Bot should be admin in this channel to remove users. Please kick and unban manually."
-                                )
-                            except (PeerIdInvalid, ValueError):
-                                error_messages.append(
-                                    f"Error removing user {subscription['user_id']} from channel {channel_id}: "
-                                    f"Let there be some interaction in the channel before using this feature. Please kick and unban manually."
-                                )
-                            except Exception as e:
-                                error_messages.append(
-                                    f"Error removing user {subscription['user_id']} from channel {channel_id}: "
-                                    f"{e}. Please kick and unban manually."
-                                )
-
-                        # Create report message
-                        message = "Users that have been removed due to expired subscriptions:\n\n"
-                        for user_id, user_fullname in expired_users:
-                            user_mention = create_user_mention(user_id, user_fullname)
-                            message += f"{user_mention}\n\n"
-
-                        if error_messages:
-                            message += "\nErrors occurred while removing users:\n\n"
-                            for error_message in error_messages:
-                                message += f"{error_message}\n\n"
-                        
-                        # Send report to channel admins
-                        channel_admins = get_admin_for_channel(session, channel_id)
-                        for admin in channel_admins:
-                            await send_long_message(bot_instance, admin.admin_id, message)
+            # Fetch and process soon to expire subscriptions
+            LOGGER.info("Trying to fetch soon to expire subscriptions")
+            soon_to_expire = await run_db(fetch_soon_to_expire_subscriptions, admin_id)
+            LOGGER.info("Done fetching soon to expire subscriptions")
+            
+            # Group subscriptions by channel
+            channel_subscriptions = {}
+            for subscription in soon_to_expire:
+                channel_id = subscription.channel.channel_id
+                if channel_id not in channel_subscriptions:
+                    channel_subscriptions[channel_id] = []
+                channel_subscriptions[channel_id].append(subscription)
+            
+            # Send notifications to relevant channel admins
+            for channel_id, subscriptions in channel_subscriptions.items():
+                message = "Subscriptions that are soon to expire:\n\n"
+                for subscription in subscriptions:
+                    user_mention = create_user_mention(subscription.user.user_id, subscription.user.fullname)
+                    channel_mention = create_channel_mention(subscription.channel.channel_name, subscription.channel.channel_id)
+                    message += f"User: {user_mention}, Channel: {channel_mention}\n Expiry Date: {subscription.expiry_date}\n\n"
                 
-                LOGGER.info("Daily routine completed")
+                # Get admins for this channel and send them the message
+                channel_admins = await run_db(get_admin_for_channel, channel_id)
+                await _enqueue([
+                    (admin.admin_id, message, f"soon-to-expire:{today}:{channel_id}:{admin.admin_id}")
+                    for admin in channel_admins
+                ])
+            
+            # Handle expired subscriptions, the expiry engine claims and removes them batch by batch.
+            # Each batch's report is enqueued as soon as it is done, so a crash mid-run only loses the batch in flight
+            async for progress in expire_subscriptions(admin_id):
+                LOGGER.info(
+                    f"Expiry batch {progress['batch']}: {progress['total_removed']} removed, "
+                    f"{progress['total_failed']} failed, {progress['total_claimed']} processed so far, "
+                    f"{progress['kick_stats']['kicks_per_second']:.1f} kicks/s, "
+                    f"{progress['kick_stats']['flood_wait_seconds']:.0f}s FloodWait pauses"
+                )
+                expired_users_by_channel = {}
+                errors_by_channel = {}
+                for subscription in progress['removed']:
+                    expired_users_by_channel.setdefault(subscription['channel_id'], []).append(
+                        (subscription['user_id'], subscription['user_fullname'])
+                    )
+                for subscription, error in progress['errors']:
+                    errors_by_channel.setdefault(subscription['channel_id'], []).append(
+                        f"Error removing user {subscription['user_id']} from channel {subscription['channel_id']}: {error}"
+                    )
+
+                # Report each channel's removals to its admins
+                notifications = []
+                for channel_id in expired_users_by_channel.keys() | errors_by_channel.keys():
+                    message = _expiry_report(expired_users_by_channel.get(channel_id, []), errors_by_channel.get(channel_id, []))
+                    channel_admins = await run_db(get_admin_for_channel, channel_id)
+                    notifications.extend(
+                        (admin.admin_id, message, f"expired:{run_id}:{progress['batch']}:{channel_id}:{admin.admin_id}")
+                        for admin in channel_admins
+                    )
+                await _enqueue(notifications)
+            
+            LOGGER.info("Daily routine completed")
     except Exception as e:
         LOGGER.error(f"Error in daily_routine : {e}")
 
 
+async def sweep_orphaned_users():
+    """
+    Low priority background job: removes users left without subscriptions or pending requests,
+    one small chunk per transaction with a pause in between so other db work keeps flowing.
+    """
+    try:
+        after, total_removed = None, 0
+        while True:
+            after, removed = await run_db(remove_extra_users_chunk, after, ORPHAN_SWEEP_CHUNK_SIZE)
+            total_removed += removed
+            if after is None:
+                break
+            await asyncio.sleep(ORPHAN_SWEEP_PAUSE_SECONDS)
+        LOGGER.info(f"Orphaned users sweep completed, removed {total_removed} users")
+    except Exception as e:
+        LOGGER.error(f"Error in sweep_orphaned_users : {e}")
+
+
+async def purge_expired_verification_codes():
+    """Background job: deletes expired verification codes in chunks, replaces the purge that ran on every invalid /code."""
+    try:
+        total_deleted = 0
+        while True:
+            deleted = await run_db(purge_expired_verification_codes_chunk, CODE_PURGE_CHUNK_SIZE)
+            total_deleted += deleted
+            if deleted < CODE_PURGE_CHUNK_SIZE:
+                break
+            await asyncio.sleep(ORPHAN_SWEEP_PAUSE_SECONDS)
+        if total_deleted:
+            LOGGER.info(f"Purged {total_deleted} expired verification codes")
+    except Exception as e:
+        LOGGER.error(f"Error in purge_expired_verification_codes : {e}")
+
+
+async def retry_failed_kicks_job(channel_id: int = None):
+    """
+    Background job: retries removals that failed in earlier expiry runs, see helpers/expiry_engine.py.
+    Each channel's admins get a report of the members removed on retry.
+    """
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    try:
+        async for result in retry_failed_kicks(channel_id):
+            if not result['removed']:
+                continue
+            message = "Users that have been removed on retry, their subscriptions had expired:\n\n"
+            for member in result['removed']:
+                message += f"{create_user_mention(member['user_id'], member['user_fullname'])}\n\n"
+            if result['remaining']:
+                message += f"\n{result['remaining']} more could not be removed yet, retrying later.\n"
+
+            channel_admins = await run_db(get_admin_for_channel, result['channel_id'])
+            await _enqueue([
+                (admin.admin_id, message, f"kick-retry:{run_id}:{result['channel_id']}:{admin.admin_id}")
+                for admin in channel_admins
+            ])
+    except Exception as e:
+        LOGGER.error(f"Error in retry_failed_kicks_job : {e}")
+
+
+def schedule_kick_retry(channel_id: int):
+    """Runs the channel's queued removals now, in the background (e.g. the bot was made admin again)."""
+    task = asyncio.create_task(retry_failed_kicks_job(channel_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def purge_sent_notifications_job():
+    """Background job: deletes delivered outbox rows once they are a week old."""
+    try:
+        total_deleted = 0
+        while True:
+            deleted = await run_db(purge_sent_notifications, chunk_size=OUTBOX_PURGE_CHUNK_SIZE)
+            total_deleted += deleted
+            if deleted < OUTBOX_PURGE_CHUNK_SIZE:
+                break
+            await asyncio.sleep(ORPHAN_SWEEP_PAUSE_SECONDS)
+        if total_deleted:
+            LOGGER.info(f"Purged {total_deleted} sent notifications")
+    except Exception as e:
+        LOGGER.error(f"Error in purge_sent_notifications_job : {e}")
+
+
 async def start_scheduler():
+    global _dispatcher_task
+    _dispatcher_task = asyncio.create_task(run_notification_dispatcher())
+
     scheduler = AsyncIOScheduler()
     current_date = datetime.now()
     next_run_time = current_date.replace(hour=0, minute=0, second=0, microsecond=0)
     if next_run_time < current_date:
         next_run_time += timedelta(days=1)
     scheduler.add_job(daily_routine, 'interval', minutes=1440, start_date=next_run_time)
+    scheduler.add_job(sweep_orphaned_users, 'interval', hours=ORPHAN_SWEEP_INTERVAL_HOURS, start_date=next_run_time + timedelta(hours=3))
+    scheduler.add_job(purge_expired_verification_codes, 'interval', minutes=CODE_PURGE_INTERVAL_MINUTES)
+    scheduler.add_job(retry_failed_kicks_job, 'interval', minutes=KICK_RETRY_INTERVAL_MINUTES)
+    scheduler.add_job(purge_sent_notifications_job, 'interval', hours=24, start_date=next_run_time + timedelta(hours=4))
     scheduler.start()
     LOGGER.info("Scheduler started")
 
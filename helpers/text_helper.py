@@ -1,8 +1,17 @@
 import re
 import asyncio
+from datetime import datetime
 from unidecode import unidecode
 from utils.logger import LOGGER
-from pyrogram.errors import FloodWait
+
+# Telegram's limit for one message
+MAX_MESSAGE_LENGTH = 4096
+
+# How long texts for a recipient are collected before they are sent (unless flushed)
+COALESCE_DELAY_SECONDS = 1.0
+
+# Recipients whose queues are sent at the same time, the API governor paces the calls themselves
+MAX_CONCURRENT_RECIPIENTS = 10
 
 async def sanitize_fullname(first_name, last_name):
     """
@@ -27,48 +36,108 @@ async def sanitize_fullname(first_name, last_name):
     
     return sanitized_fullname
 
-async def send_long_message(client, chat_id: int, text: str):
-    """Send a long message in multiple chunks to the chat."""
-    
-    # Check if chat_id is valid (positive number)
-    if not isinstance(chat_id, int) or chat_id <= 0:
-        LOGGER.error(f"Invalid chat ID: {chat_id}. Must be a positive integer.")
-        return
-    
-    # Check if the text is empty
-    if not text.strip():
-        LOGGER.warning("Attempted to send an empty message.")
-        return
-    
-    chunks = split_message(text)
-    
-    for idx, chunk in enumerate(chunks, start=1):
-        while True:
+class OutboundQueue:
+    """
+    Outbound messages, queued per recipient.
+
+    Texts queued for the same chat within COALESCE_DELAY_SECONDS are packed into as few
+    messages as possible (up to MAX_MESSAGE_LENGTH each). Every recipient is drained by its own task,
+    so different chats are served concurrently; the global rate budget is the API governor's.
+
+    Usage -
+        OUTBOUND_QUEUE.enqueue(client, chat_id, text)   # returns immediately
+        await OUTBOUND_QUEUE.flush(chat_id)              # wait until sent (all chats when None)
+    """
+
+    def __init__(self, coalesce_delay: float = COALESCE_DELAY_SECONDS, max_concurrent: int = MAX_CONCURRENT_RECIPIENTS):
+        self.coalesce_delay = coalesce_delay
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._pending = {}
+        self._wake = {}
+        self._workers = {}
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+
+    def enqueue(self, client, chat_id: int, text: str):
+        # Check if chat_id is valid (positive number)
+        if not isinstance(chat_id, int) or chat_id <= 0:
+            LOGGER.error(f"Invalid chat ID: {chat_id}. Must be a positive integer.")
+            return
+
+        # Check if the text is empty
+        if not text or not text.strip():
+            LOGGER.warning("Attempted to send an empty message.")
+            return
+
+        self._pending.setdefault(chat_id, []).append(text)
+        self.queued += 1
+        if chat_id not in self._workers:
+            self._wake[chat_id] = asyncio.Event()
+            self._workers[chat_id] = asyncio.create_task(self._drain(client, chat_id))
+
+    async def _drain(self, client, chat_id: int):
+        try:
+            # Give other texts for this chat a moment to arrive, unless someone is waiting on flush()
             try:
-                # Log the chunk being sent
-                LOGGER.info(f"Sending chunk {idx}/{len(chunks)} to chat {chat_id}. Length: {len(chunk)} characters.")
-                
-                # Send the chunk to the chat
-                await client.send_message(chat_id, chunk)
-                
-                # Log successful sending
-                LOGGER.info(f"Chunk {idx} sent successfully.")
-                break  # Exit the while loop if successful
-            except FloodWait as e:
-                # Handle FloodWait error
-                wait_time = e.value
-                LOGGER.warning(f"FloodWait error for chat {chat_id}. Waiting for {wait_time} seconds.")
-                await asyncio.sleep(wait_time)
-                # Retry sending the chunk after waiting
-
-            except Exception as e:
-                # Log any other exception that occurs while sending the message
-                LOGGER.error(f"Error sending chunk {idx} to chat {chat_id}: {e}")
-                break  # Stop further sending if a non-FloodWait error occurs
+                await asyncio.wait_for(self._wake[chat_id].wait(), timeout=self.coalesce_delay)
+            except asyncio.TimeoutError:
+                pass
+
+            async with self._semaphore:
+                while self._pending.get(chat_id):
+                    texts = self._pending.pop(chat_id)
+                    chunks = pack_messages(texts)
+                    LOGGER.info(f"Sending {len(texts)} queued texts to chat {chat_id} as {len(chunks)} messages.")
+                    for idx, chunk in enumerate(chunks, start=1):
+                        try:
+                            await client.send_message(chat_id, chunk)
+                            self.sent += 1
+                        except Exception as e:
+                            self.failed += 1
+                            LOGGER.error(f"Error sending chunk {idx} to chat {chat_id}: {e}")
+        finally:
+            self._workers.pop(chat_id, None)
+            self._wake.pop(chat_id, None)
+
+    async def flush(self, chat_id: int = None):
+        """Sends what is queued right away and waits until it is delivered (or failed)."""
+        chat_ids = [chat_id] if chat_id is not None else list(self._workers)
+        for queued_chat_id in chat_ids:
+            worker = self._workers.get(queued_chat_id)
+            if worker is None:
+                continue
+            self._wake[queued_chat_id].set()
+            await asyncio.shield(worker)
+
+    def stats(self) -> dict:
+        return {
+            "recipients_pending": len(self._workers),
+            "texts_queued": self.queued,
+            "messages_sent": self.sent,
+            "messages_failed": self.failed,
+        }
+
+
+OUTBOUND_QUEUE = OutboundQueue()
+
+
+def queue_message(client, chat_id: int, text: str):
+    """Queue a text for `chat_id`, it is coalesced with other texts for the same chat. See OutboundQueue."""
+    OUTBOUND_QUEUE.enqueue(client, chat_id, text)
+
+async def flush_messages(chat_id: int = None):
+    """Wait until everything queued for `chat_id` (or for every chat) has been sent."""
+    await OUTBOUND_QUEUE.flush(chat_id)
+
+async def send_long_message(client, chat_id: int, text: str):
+    """Send a long message in multiple chunks to the chat, waits until it is delivered."""
+    queue_message(client, chat_id, text)
+    await flush_messages(chat_id)
 
 
 # supporting Helper function 
-def split_message(text: str, max_length: int = 4096) -> list:
+def split_message(text: str, max_length: int = MAX_MESSAGE_LENGTH) -> list:
     """Splits the input text into chunks not exceeding max_length, avoiding breaking in the middle of words."""
     
     # Initialize a list to hold the chunks
@@ -94,6 +163,22 @@ def split_message(text: str, max_length: int = 4096) -> list:
     
     return chunks
 
+def pack_messages(texts: list, max_length: int = MAX_MESSAGE_LENGTH, separator: str = "\n\n") -> list:
+    """Packs texts (in order) into as few messages as possible, splitting only texts that don't fit in one message."""
+    messages = []
+    current = ""
+    for text in texts:
+        for part in split_message(text, max_length):
+            if current and len(current) + len(separator) + len(part) <= max_length:
+                current += separator + part
+            else:
+                if current:
+                    messages.append(current)
+                current = part
+    if current:
+        messages.append(current)
+    return messages
+
 def create_channel_mention(channel_name, channel_id):
     """
     Creates a mention for a channel.
@@ -121,4 +206,109 @@ def create_user_mention(user_id, user_fullname):
         str: The mention for the user.
     """
     mention = f"[{user_fullname}](tg://user?id={user_id})"
-    return mention
\ No newline at end of file
+    return mention
+
+def parse_duration(duration_text: str) -> tuple:
+    """Parse the duration_text and return value and unit or a date."""
+    LOGGER.info(f"Entering parse_duration with duration_text={duration_text}")
+    
+    # Check for 'kick' command
+    if duration_text.strip().lower() == "kick":
+        LOGGER.info("Exiting parse_duration: 'kick' action detected.")
+        return "kick", None
+
+    # Check for valid date format (DD-MM-YYYY or YYYY-MM-DD)
+    for date_format in ["%d-%m-%Y", "%Y-%m-%d"]:
+        try:
+            expiry_date = datetime.strptime(duration_text, date_format)
+            LOGGER.info(f"Exiting parse_duration: Valid date format detected: {duration_text}")
+            return "date", expiry_date
+        except ValueError:
+            continue  # Try the next format
+
+    # Handle duration formats like 20d, 3w, etc.
+    duration_map = {
+        'd': 'days',
+        'w': 'weeks',
+        'm': 'months',
+        'y': 'years'
+    }
+
+    try:
+        value = int(duration_text[:-1])  # Get the numeric part
+        unit = duration_text[-1].lower()  # Get the unit part (d, w, m, y)
+
+        if unit not in duration_map:
+            raise ValueError("Invalid duration unit. Use 'd', 'w', 'm', or 'y'.")
+        
+        LOGGER.info(f"Exiting parse_duration with parsed values: unit={unit}, value={value}")
+        return unit, value
+    except (ValueError, IndexError):
+        LOGGER.warning("Exiting parse_duration: Invalid duration format.")
+        raise ValueError("Invalid duration format. Use formats like '20d', '2w', '3m', '1y', 'DD-MM-YYYY' or 'YYYY-MM-DD'.")
+
+def parse_bulk_update(text: str, user_ids: list) -> tuple:
+    """
+    Parses the admin's `<index> [duration]` lines without touching the database.
+    A user listed on several lines gets the last valid one, a kick included.
+
+    Returns:
+        Tuple: (changes as (user_id, action, value), user_ids to kick, messages for the rejected lines)
+    """
+    latest, errors = {}, []
+    for line in text.strip().lower().split('\n'):
+        parts = line.strip().split()
+        if not parts:
+            continue  # Skip empty lines
+
+        idx = parts[0]
+        if not idx.isdigit():
+            errors.append(f"Invalid index '{idx}'.")
+            continue
+
+        idx = int(idx) - 1  # Adjust for zero-based index
+        if idx < 0 or idx >= len(user_ids):
+            errors.append(f"Index '{idx + 1}' is out of range.")
+            continue
+
+        user_id = user_ids[idx]
+
+        # Determine the action
+        if len(parts) == 1:
+            # Default extension
+            duration_text = '30d'
+        elif len(parts) == 2:
+            duration_text = parts[1]
+        elif len(parts) == 3:
+            duration_text = parts[1] + parts[2]
+        else:
+            errors.append(f"Invalid format in line: '{line.strip()}'.")
+            continue
+
+        try:
+            action, value = parse_duration(duration_text)
+        except ValueError as e:
+            errors.append(f"Line '{line.strip()}': {e}")
+            continue
+
+        latest.pop(user_id, None)  # Re-inserted, so users stay in the order of their last line
+        latest[user_id] = (action, value)
+
+    changes = [(user_id, action, value) for user_id, (action, value) in latest.items() if action != "kick"]
+    kicks = [user_id for user_id, (action, _) in latest.items() if action == "kick"]
+    return changes, kicks, errors
+
+def format_bulk_update_report(channel_name: str, updated: list, kicked: list, errors: list) -> str:
+    report = f"**Subscription updates for {channel_name}**\n\n"
+    if updated:
+        report += f"✅ Updated {len(updated)} subscriptions:\n"
+        report += "\n".join(
+            f"{create_user_mention(row['user_id'], row['fullname'])} - expires on `{row['expiry_date']}`" for row in updated
+        ) + "\n\n"
+    if kicked:
+        report += "\n".join(kicked) + "\n\n"
+    if errors:
+        report += f"⚠️ Skipped {len(errors)}:\n" + "\n".join(errors) + "\n\n"
+    if not (updated or kicked or errors):
+        report += "No updates found in your message.\n\n"
+    return report + "You can enter more updates or type 'done' to finish."
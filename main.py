@@ -1,10 +1,18 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+
+from utils.config import Config
+from utils.logger import LOGGER
+CONFIG_LOADED = time.perf_counter()
+
+from db.connection import init_db, prewarm_pool
 # from server import run_server
 from server import keep_alive
 from bot.bot_instance import get_bot_instance
-from db.connection import Base, engine
 from helpers.scheduler import start_scheduler
 import argparse
 import asyncio
+import logging
 from pyrogram import idle
 
 async def main():
@@ -15,9 +23,15 @@ async def main():
     args = parser.parse_args()
 
     if args.debug:
+        LOGGER.setLevel(logging.DEBUG)
         print("Debug mode enabled")
 
-    Base.metadata.create_all(bind=engine)
+    # Build the engine and check the schema (DDL only when outdated), then
+    # open pooled connections before updates start arriving
+    db_started = time.perf_counter()
+    init_db()
+    prewarm_pool()
+    db_seconds = time.perf_counter() - db_started
     print("Database initialized.")
 
     print("Bot is being started...")
@@ -25,7 +39,18 @@ async def main():
 
     async def start_bot_and_scheduler():
         bot_instance.loop.create_task(start_scheduler())  # Start scheduler as a background task
+        bot_started = time.perf_counter()
         await bot_instance.start()  # Start the bot (crucially AFTER creating scheduler task)
+        start_seconds = time.perf_counter() - bot_started
+
+        # Plugins are imported inside start(), the rest of it is the connect/authorize round trips
+        LOGGER.info(
+            f"Startup timings - config: {(CONFIG_LOADED - STARTUP_STARTED) * 1000:.0f} ms, "
+            f"DB: {db_seconds * 1000:.0f} ms, "
+            f"bot connect: {(start_seconds - bot_instance.plugin_load_seconds) * 1000:.0f} ms, "
+            f"plugin load: {bot_instance.plugin_load_seconds * 1000:.0f} ms, "
+            f"total: {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f} ms"
+        )
         print("Bot and scheduler started. Press Ctrl+C to stop.")
         await idle()
         await bot_instance.stop()
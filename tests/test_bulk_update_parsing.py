@@ -0,0 +1,48 @@
+"""
+parse_bulk_update and format_bulk_update_report, the database-free half of /updatesubscriptions.
+"""
+import os
+from datetime import datetime
+
+# Config needs these at import time, nothing here talks to Telegram or the database
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from helpers.text_helper import parse_bulk_update, format_bulk_update_report
+
+USER_IDS = [101, 102, 103]
+
+
+def test_last_line_for_a_user_wins():
+    changes, kicks, errors = parse_bulk_update("1 10d\n2 kick\n1 2w\n2 1m\n3 1y\n3 kick", USER_IDS)
+
+    assert changes == [(101, "w", 2), (102, "m", 1)]
+    assert kicks == [103]
+    assert errors == []
+
+
+def test_kicks_and_rejected_lines_are_split_from_changes():
+    changes, kicks, errors = parse_bulk_update("1\n2 KICK\n3 31-12-2030\n4 10d\nx 10d\n1 10 d extra\n3 10q", USER_IDS)
+
+    assert changes == [(101, "d", 30), (103, "date", datetime(2030, 12, 31))]
+    assert kicks == [102]
+    assert errors[0] == "Index '4' is out of range."
+    assert errors[1] == "Invalid index 'x'."
+    assert errors[2] == "Invalid format in line: '1 10 d extra'."
+    assert errors[3].startswith("Line '3 10q': Invalid duration")
+    assert len(errors) == 4
+
+
+def test_report_lists_updates_kicks_and_errors():
+    updated = [{"user_id": 101, "fullname": "Alice", "expiry_date": "2030-12-31"}]
+    report = format_bulk_update_report("VIP", updated, ["Bob was removed"], ["Index '4' is out of range."])
+
+    assert report.startswith("**Subscription updates for VIP**\n\n")
+    assert "✅ Updated 1 subscriptions:\n[Alice](tg://user?id=101) - expires on `2030-12-31`\n\n" in report
+    assert "Bob was removed\n\n" in report
+    assert "⚠️ Skipped 1:\nIndex '4' is out of range.\n\n" in report
+    assert "No updates found" not in report
+
+
+def test_report_without_any_update():
+    assert "No updates found in your message." in format_bulk_update_report("VIP", [], [], [])
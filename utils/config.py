@@ -10,6 +10,7 @@ class Config:
     API_ID = int(os.getenv("API_ID"))
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     DB_URI = os.getenv("DATABASE_URI")
+    DB_URL_OVERRIDE = os.getenv("DB_URL_OVERRIDE")  # One database URL for both engines instead of the DB_* settings, SSL is still enforced for PostgreSQL; SQLite must be a file (sqlite:///bot.db)
     ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS").split(",")))
     DEV_IDS = list(map(int, os.getenv("DEV_IDS", "0,0").split(",")))
     MY_ID = os.getenv("MY_ID")
@@ -27,6 +28,48 @@ class Config:
     CONNECTION_STRING = os.getenv("CONNECTION_STRING")
     CA_CERT_PATH = os.getenv("DB_CA_CERT_PATH","utils/ca.pem")
 
+    # Connection pool tuning
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds, -1 disables recycling
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds to wait for a free connection
+    DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "true").lower() == "true"
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", 2))  # connections opened before the bot starts
+    DB_SLOW_CHECKOUT_MS = int(os.getenv("DB_SLOW_CHECKOUT_MS", 500))
+
+    # In-process caches
+    CHANNEL_CACHE_SIZE = int(os.getenv("CHANNEL_CACHE_SIZE", 1024))
+    CHANNEL_CACHE_TTL = int(os.getenv("CHANNEL_CACHE_TTL", 600))  # seconds
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 3600))  # seconds
+
+    # Telegram API governor: budgets shared by all outbound calls (calls per second)
+    TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 25))
+    TG_GLOBAL_BURST = int(os.getenv("TG_GLOBAL_BURST", 30))
+    TG_PER_CHAT_RATE = float(os.getenv("TG_PER_CHAT_RATE", 2))
+    TG_PER_CHAT_BURST = int(os.getenv("TG_PER_CHAT_BURST", 5))
+
+    # Bot's own status/privileges per chat, re-fetched after the TTL; set the file to persist them across restarts
+    BOT_PRIVILEGES_TTL = int(os.getenv("BOT_PRIVILEGES_TTL", 6 * 3600))  # seconds
+    BOT_PRIVILEGES_FILE = os.getenv("BOT_PRIVILEGES_FILE")
+
+    # Kick pipeline (expiry runs): concurrent workers and per-chat rate budget
+    KICK_WORKERS = int(os.getenv("KICK_WORKERS", 8))
+    KICK_RATE_PER_CHAT = float(os.getenv("KICK_RATE_PER_CHAT", 1.0))  # kicks per second (2 API calls each)
+    KICK_BURST_PER_CHAT = int(os.getenv("KICK_BURST_PER_CHAT", 3))
+
+    # Join requests are worked off by their own pool, apart from the TG_BOT_WORKERS handling updates
+    JOIN_REQUEST_WORKERS = int(os.getenv("JOIN_REQUEST_WORKERS", 4))
+    JOIN_REQUEST_QUEUE_SIZE = int(os.getenv("JOIN_REQUEST_QUEUE_SIZE", 10000))
+
+    # Notification outbox: rows claimed per dispatcher round, and how often it polls for retries without being woken
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_POLL_SECONDS = int(os.getenv("OUTBOX_POLL_SECONDS", 30))
+
+    # Debug logging (table dump at startup etc.), also enabled by `main.py --debug`
+    DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+
     # Optional
     WHITELISTED_CHATS = list(map(int, os.getenv("WHITELISTED_CHATS", "0").split(",")))
     BLACKLISTED_CHATS = list(map(int, os.getenv("WHITELISTED_CHATS", "0").split(",")))
@@ -5,7 +5,7 @@ from .config import Config
 def setup_logger():
     try:
         logger = logging.getLogger(Config.LOGGER_NAME)
-        logger.setLevel(logging.INFO)
+        logger.setLevel(logging.DEBUG if Config.DEBUG else logging.INFO)
 
         handler = RotatingFileHandler("bot.log", maxBytes=10 * 1024 * 1024, backupCount=10)
         formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")